@@ -0,0 +1,329 @@
+# Benchmarks for extract_astraforge_v1.py over synthetic responses shaped
+# like initial_response_data.txt. Each case runs in a fresh process, so its
+# peak RSS is its own; throughput is the best of --repeat runs, and a further
+# traced run splits the time into stages. Results are saved as JSON and can
+# be compared against an earlier run with --compare.
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import extract_astraforge_v1 as extractor
+
+MIN_SIZE, MAX_SIZE = 1 << 20, 5 << 30
+MIN_FILES, MAX_FILES = 10, 100_000
+UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+# (extension, fence language, directory) of the generated files
+KINDS = (
+    ('ts', 'typescript', 'src/providers'), ('ts', 'typescript', 'src/llm'), ('ts', 'typescript', 'src/workflow'),
+    ('js', 'javascript', 'media'), ('json', 'json', 'config'), ('css', 'css', 'media/styles'),
+    ('md', 'markdown', 'docs'),
+)
+DESCRIPTIONS = ('Manifest', 'Main entry point', 'Webview provider', 'Updated with vector DB caching',
+                'basic CSS for UI', 'Utility functions', 'Git integration')
+PROSE = (
+    'Below is the full implementation. It is modular, with multi-agent LLM collaboration and vector-based '
+    'context retrieval.\n',
+    'Note: run `npm install`, compile with `tsc`, and load the extension in VS Code for testing.\n',
+    'This MVP focuses on the core workflow; expand it for production (real embedding models, more UI polish).\n',
+)
+TREE = (
+    '### Folder Structure\nastraforge-ide\n├── package.json\n├── src\n│   ├── extension.ts\n'
+    '│   └── providers\n│       └── setupWizard.ts\n└── out (compiled JS)\n\ntext\n\nCollapse\n\nWrap\n\nCopy\n'
+)
+
+
+def parse_size(text):
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?\s*', text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f'invalid size: {text!r} (use e.g. 1MB, 250MB or 5GB)')
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def body_lines(rng, lang, count=400):
+    # A pool of code lines for lang; bodies repeat it, so generating
+    # gigabytes costs little more than writing them
+    identifiers = [f'{rng.choice(("llm", "panel", "phase", "vector", "git", "agent"))}{n}' for n in range(count)]
+    if lang == 'json':
+        lines = [f'  "{name}": "{rng.randrange(1 << 30):x}",\n' for name in identifiers]
+    elif lang == 'css':
+        lines = [f'.{name} {{ margin: {rng.randrange(32)}px; color: #{rng.randrange(1 << 24):06x}; }}\n'
+                 for name in identifiers]
+    elif lang == 'markdown':
+        lines = [f'- `{name}`: handles phase {rng.randrange(9)} of the workflow.\n' for name in identifiers]
+    else:
+        lines = [f'  const {name} = await this.llmManager.query(`{name}`, {rng.randrange(1000)});\n'
+                 for name in identifiers]
+    return ''.join(lines).encode()
+
+
+def emit_repeated(emit, block, size):
+    # emit() block repeated to about size bytes, cut after a whole line; a
+    # block at a time, so a large body is never built in memory
+    whole, rest = divmod(max(size, 1), len(block))
+    for _ in range(whole):
+        emit(block)
+    tail = block[:block.rfind(b'\n', 0, rest) + 1]
+    if not whole and not tail:
+        tail = block[:block.find(b'\n') + 1]
+    if tail:
+        emit(tail)
+
+
+def generate_response(path, size, files, seed=0):
+    # Write a response of about size bytes with files distinct files to path,
+    # mixing the section shapes seen in real responses:
+    #   "## File: path (description)" headers with a language line and the
+    #   Collapse/Wrap/Copy chrome before the fence, "### src/....ts" shorthand
+    #   headers, markdown files whose fence nests shorter fences, prose
+    #   between sections and "### path (as above)" back-references.
+    # Returns what was generated.
+    rng = random.Random(seed)
+    pools = {lang: body_lines(rng, lang) for _, lang, _ in KINDS}
+    written = sections = 0
+    paths = []
+    with open(path, 'wb') as f:
+        def emit(text):
+            nonlocal written
+            data = text if isinstance(text, bytes) else text.encode()
+            f.write(data)
+            written += len(data)
+
+        emit('## AstraForge IDE Extension Code\n\n' + ''.join(PROSE) + '\n' + TREE)
+        for index in range(files):
+            ext, lang, directory = KINDS[index % len(KINDS)]
+            file_path = f'{directory}/module{index}.{ext}'
+            remaining = files - index
+            body_size = max(64, (size - written) // remaining - 160)
+            if lang == 'markdown':
+                # The ```typescript block inside must not close the ````markdown fence
+                emit(f'## File: {file_path}\n````markdown\n# Module {index}\n')
+                emit_repeated(emit, pools[lang], body_size // 2)
+                emit('```typescript\n')
+                emit_repeated(emit, pools['typescript'], body_size // 2)
+                emit('```\n````\n')
+            elif ext == 'ts' and index % 3 == 0:
+                emit(f'### {file_path}\n```{lang}\n')
+                emit_repeated(emit, pools[lang], body_size)
+                emit('```\n')
+            else:
+                description = rng.choice(DESCRIPTIONS)
+                chrome = 'Collapse\n\nWrap\n\nRun\n\nCopy\n' if lang in ('typescript', 'javascript') \
+                    else 'Collapse\n\nWrap\n\nCopy\n'
+                emit(f'## File: {file_path} ({description})\n{lang}\n\n{chrome}```{lang}\n')
+                emit_repeated(emit, pools[lang], body_size)
+                emit('```\n')
+            sections += 1
+            paths.append(file_path)
+            if index % 25 == 24:
+                emit(rng.choice(PROSE))
+            if index % 50 == 49:
+                # A back-reference to a file given earlier, as a shorthand header
+                earlier = rng.choice([p for p in paths[-50:] if p.startswith(('src/', 'media/')) and
+                                      p.endswith(('.ts', '.js'))] or [None])
+                if earlier is not None:
+                    emit(f'\n### {earlier} (as above)\n\n')
+                    sections += 1
+    return {'path': os.path.abspath(path), 'bytes': written, 'files': files, 'sections': sections, 'seed': seed}
+
+
+def extract_text(response_path, output_dir):
+    # The original entry point: the whole response read as text, then
+    # extract_files()
+    with open(response_path, encoding='utf-8') as f:
+        extractor.extract_files(f.read(), output_dir)
+
+
+def extract_async(response_path, output_dir):
+    with open(response_path, 'rb', buffering=0) as f:
+        extractor.asyncio.run(extractor.extract_stream(extractor.FileStream(f), output_dir))
+
+
+CASES = {
+    'extract_files': extract_text,
+    'read': lambda path, out: extractor.extract_path(path, out),
+    'mmap': lambda path, out: extractor.extract_path(path, out, mode='mmap'),
+    'threads': lambda path, out: extractor.extract_path(path, out, writer_options=extractor.WriterOptions(threads=4)),
+    'shards': lambda path, out: extractor.extract_sharded(path, out),
+    'stream': extract_async,
+}
+BASELINE = 'extract_files'
+
+
+def peak_rss():
+    # Peak resident set size in MB of this process and of its largest
+    # finished child, or None where the resource module is missing
+    if resource is None:
+        return None, None
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in bytes on macOS, KiB elsewhere
+    return tuple(resource.getrusage(who).ru_maxrss * scale / 1e6
+                 for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+
+
+def run_case(name, response_path, output_dir, trace):
+    # Runs in a fresh worker process. With trace, also returns the seconds
+    # spent in each kind of span.
+    if trace:
+        extractor.enable_tracing('bench')
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            started = time.perf_counter()
+            CASES[name](response_path, output_dir)
+            seconds = time.perf_counter() - started
+        finally:
+            sys.stdout = stdout
+    result = {'seconds': seconds}
+    result['peak_rss_mb'], result['peak_child_rss_mb'] = peak_rss()
+    if trace:
+        stages = {}
+        for event in extractor.TRACER.events:
+            if event['ph'] == 'X':
+                stages[event['name']] = stages.get(event['name'], 0.0) + event['dur'] / 1e6
+        result['stages'] = dict(sorted(stages.items()))
+    return result
+
+
+def run_isolated(name, response_path, output_dir, trace=False):
+    shutil.rmtree(output_dir, ignore_errors=True)
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            return pool.submit(run_case, name, response_path, output_dir, trace).result()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench(response_path, work_dir, cases, repeat=3, stages=True):
+    # Best-of-repeat time, throughput and peak RSS of each case, plus a stage
+    # breakdown from a traced run (tracing buffers sections, so it is kept
+    # out of the timed runs)
+    size = os.path.getsize(response_path)
+    sections = sum(1 for kind, _, _ in extractor.mapped_events(response_path) if kind == extractor.END) if size \
+        else 0
+    output_dir = os.path.join(work_dir, 'out')
+    results = {}
+    for name in cases:
+        runs = [run_isolated(name, response_path, output_dir) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r['seconds'])
+        result = {
+            'seconds': best['seconds'], 'runs': [r['seconds'] for r in runs],
+            'mb_per_s': size / 1e6 / max(best['seconds'], 1e-9),
+            'sections_per_s': sections / max(best['seconds'], 1e-9),
+            'peak_rss_mb': max((r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None), default=None),
+            'peak_child_rss_mb': max((r['peak_child_rss_mb'] for r in runs if r['peak_child_rss_mb']), default=None),
+        }
+        if stages:
+            result['stages'] = run_isolated(name, response_path, output_dir, trace=True)['stages']
+        results[name] = result
+        print(f"{name:14} {result['seconds']:8.3f}s {result['mb_per_s']:9.1f} MB/s "
+              f"{result['sections_per_s']:10.0f} sections/s  peak RSS "
+              + (f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else 'n/a'))
+    if BASELINE in results:
+        for result in results.values():
+            result['speedup'] = results[BASELINE]['seconds'] / max(result['seconds'], 1e-9)
+    return {'sections': sections, 'cases': results}
+
+
+def compare(results, previous, tolerance):
+    # Print each case's throughput against an earlier results file; returns
+    # the cases slower than it by more than tolerance (a fraction)
+    regressions = []
+    for name, result in results['cases'].items():
+        old = previous.get('cases', {}).get(name)
+        if old is None:
+            continue
+        change = result['mb_per_s'] / max(old['mb_per_s'], 1e-9) - 1
+        flag = ''
+        if change < -tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:14} {old['mb_per_s']:9.1f} -> {result['mb_per_s']:9.1f} MB/s ({change:+.1%}){flag}")
+    if previous.get('corpus', {}).get('bytes') != results['corpus']['bytes']:
+        print('Note: the earlier run used a different corpus size.')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark extract_astraforge_v1.py on synthetic responses.')
+    parser.add_argument('--size', type=parse_size, default=parse_size('100MB'),
+                        help='size of the generated response, from 1MB to 5GB (default: 100MB)')
+    parser.add_argument('--files', type=int, default=10_000,
+                        help=f'distinct files in the generated response, from {MIN_FILES} to {MAX_FILES} '
+                             '(default: 10000)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated response')
+    parser.add_argument('--corpus', metavar='PATH', help='benchmark this response instead of generating one')
+    parser.add_argument('--generate', metavar='PATH', help='only write the generated response to PATH')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f'comma-separated cases to run (default: all of {", ".join(CASES)})')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case; the best is kept')
+    parser.add_argument('--no-stages', action='store_true', help='skip the traced run that times each stage')
+    parser.add_argument('--work-dir', help='where to write the corpus and outputs (default: a temporary directory)')
+    parser.add_argument('--results', default='bench_results.json', metavar='PATH',
+                        help='where to save the JSON results (default: bench_results.json)')
+    parser.add_argument('--compare', metavar='PATH', help='compare throughput with an earlier results file')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='with --compare, the slowdown (fraction) above which a case counts as a '
+                             'regression and the exit status is 1 (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    if not MIN_SIZE <= args.size <= MAX_SIZE:
+        parser.error('--size must be between 1MB and 5GB')
+    if not MIN_FILES <= args.files <= MAX_FILES:
+        parser.error(f'--files must be between {MIN_FILES} and {MAX_FILES}')
+    cases = [name.strip() for name in args.cases.split(',') if name.strip()]
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f'unknown cases: {", ".join(unknown)}')
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+    if args.generate:
+        corpus = generate_response(args.generate, args.size, args.files, args.seed)
+        print(f"Wrote {corpus['bytes'] / 1e6:.1f} MB with {corpus['files']} files to {args.generate}.")
+        return
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='astraforge-bench-')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        if args.corpus:
+            corpus = {'path': os.path.abspath(args.corpus), 'bytes': os.path.getsize(args.corpus)}
+        else:
+            started = time.perf_counter()
+            corpus = generate_response(os.path.join(work_dir, 'response.txt'), args.size, args.files, args.seed)
+            print(f"Generated {corpus['bytes'] / 1e6:.1f} MB with {corpus['files']} files "
+                  f"in {time.perf_counter() - started:.1f}s.")
+        results = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'corpus': corpus, 'repeat': args.repeat,
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        }
+        results.update(bench(corpus['path'], work_dir, cases, args.repeat, not args.no_stages))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    with open(args.results, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results saved to {args.results}.')
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(results, previous, args.tolerance):
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
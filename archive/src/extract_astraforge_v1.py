@@ -1,66 +1,2615 @@
+import argparse
+import asyncio
+import bisect
+import collections
+import cProfile
+import fnmatch
+import functools
+import glob
+import hashlib
+import io
+import itertools
+import json
+import mmap
 import os
+import posixpath
 import re
+import shutil
+import signal
+import socket
+import sqlite3
+import stat
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import tracemalloc
+import uuid
+import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 
-def extract_files(response_text, output_dir='astraforge-ide'):
-    # Create output dir if not exists
-    os.makedirs(output_dir, exist_ok=True)
-    log = []  # Traceability log
-
-    # Split into sections based on "## File: " or similar markers
-    sections = re.split(r'(## File: |### src/.*\.ts|### media/.*\.js|### media/styles\.css)', response_text)
-    
-    current_file = None
-    content = []
-    for part in sections:
-        if part.strip() == '':
-            continue
-        if part.startswith('## File: ') or part.startswith('### '):
-            # Save previous file if exists
-            if current_file:
-                file_path = os.path.join(output_dir, current_file)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(content).strip())
-                log.append(f'Created: {file_path}')
-            
-            # New file
-            if part.startswith('## File: '):
-                current_file = part.split('## File: ')[1].strip()
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Section headers, matched at the start of a line: "## File: path (notes)" or
+# the "### src/....ts" / "### media/....js" shorthand used for later files.
+HEADER_PATTERN = (
+    r'## File: (?P<file>[^\n]*)'
+    r'|### (?P<sub>src/[^\n]*?\.ts|media/[^\n]*?\.js|media/styles\.css)(?![\w.])'
+)
+# Fences may be indented by up to 3 spaces, as in list items (CommonMark)
+FENCE_PATTERN = r' {0,3}(`{3,})[ \t]*(\w*)'
+CLOSE_PATTERN = r' {0,3}(`{3,})[ \t\r]*$'
+
+# (header, fence, close, newline, '#', '```', ' ') for str input and for
+# bytes-like input (bytes, mmap), so mapped files are scanned without decoding
+TEXT_GRAMMAR = (
+    re.compile(HEADER_PATTERN), re.compile(FENCE_PATTERN), re.compile(CLOSE_PATTERN),
+    '\n', '#', '```', ' ',
+)
+BYTES_GRAMMAR = (
+    re.compile(HEADER_PATTERN.encode()), re.compile(FENCE_PATTERN.encode()), re.compile(CLOSE_PATTERN.encode()),
+    b'\n', b'#', b'```', b' ',
+)
+WHITESPACE = frozenset(b' \t\n\r\x0b\x0c')
+
+# scan() events
+HEADER, DATA, END = 'header', 'data', 'end'
+CHUNK_SIZE = 1 << 20  # Longest DATA span handed to a writer
+TEMP_IDS = itertools.count()  # Makes atomic-write temp names unique
+PARSER_VERSION = 2  # Bump when a change to the grammar or Scanner changes its events
+FICLONE = 0x40049409  # Linux ioctl making a copy-on-write clone of a file
+
+TRACER = None  # Tracer while --trace is on
+COUNTERS = None  # collections.Counter of hot-path events while --profile is on
+METRICS = None  # Metrics while --metrics is on
+PROGRESS = None  # Progress while --progress is on
+
+DEFAULT_RESPONSE_PATH = r"C:\Users\up2it\Desktop\AstraForge\%TEMP%\response.txt"
+
+
+class Tracer:
+    # Spans recorded for --trace in Chrome trace-event format, which loads in
+    # Perfetto and chrome://tracing. Each process records its own; worker
+    # processes hand theirs back with their results (see drain()).
+    def __init__(self, name='extract'):
+        self.events = []
+        self.threads = set()
+        self.process(name)
+
+    def process(self, name):
+        self.events.append({'ph': 'M', 'name': 'process_name', 'pid': os.getpid(), 'args': {'name': name}})
+
+    def span(self, name, started, ended=None, **args):
+        # A span from started to ended (time.perf_counter() values, ended
+        # defaulting to now) on the calling thread
+        ended = time.perf_counter() if ended is None else ended
+        pid, tid = os.getpid(), threading.get_native_id()
+        if tid not in self.threads:
+            self.threads.add(tid)
+            self.events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': tid,
+                                'args': {'name': threading.current_thread().name}})
+        self.events.append({'name': name, 'ph': 'X', 'ts': started * 1e6, 'dur': (ended - started) * 1e6,
+                            'pid': pid, 'tid': tid, 'args': args})
+
+    def drain(self):
+        events, self.events = self.events, []
+        self.threads = set()
+        return events
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+def enable_tracing(name='worker'):
+    # Also the initializer of worker processes while tracing
+    global TRACER
+    TRACER = Tracer(name)
+
+
+class CountingPattern:
+    # Compiled pattern that counts the matches tried with it in COUNTERS;
+    # stands in for the grammar's patterns under --profile
+    def __init__(self, pattern, name):
+        self.pattern = pattern
+        self.name = name
+
+    def match(self, *args):
+        COUNTERS[self.name] += 1
+        return self.pattern.match(*args)
+
+
+def enable_counters():
+    # Counting is switched on by swapping the grammars, so it costs nothing
+    # when it is off
+    global COUNTERS, TEXT_GRAMMAR, BYTES_GRAMMAR
+    COUNTERS = collections.Counter()
+    for name in ('TEXT_GRAMMAR', 'BYTES_GRAMMAR'):
+        header_re, fence_re, close_re, *tokens = globals()[name]
+        globals()[name] = (CountingPattern(header_re, 'header_matches'), CountingPattern(fence_re, 'fence_matches'),
+                           CountingPattern(close_re, 'close_matches'), *tokens)
+
+
+class Profiler:
+    # --profile: cProfile stats of the main thread (.pstats), stacks of all
+    # threads sampled every interval seconds in collapsed form for flame
+    # graph tools (.collapsed), the top allocations traced by tracemalloc
+    # (.tracemalloc.txt) and the hot-path COUNTERS (.counters.json), saved
+    # under one path prefix. Worker processes add their counters.
+    def __init__(self, prefix, interval=0.001):
+        self.prefix = prefix
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name='profile sampler', daemon=True)
+
+    def start(self):
+        enable_counters()
+        tracemalloc.start()
+        # The sampler only runs when it gets the GIL; a short switch interval
+        # keeps its samples from favouring code that releases it
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(self.interval / 2)
+        self.sampler.start()
+        self.profile.enable()
+
+    def sample(self):
+        names = {}
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == self.sampler.ident:
+                    continue
+                if ident not in names:
+                    names[ident] = next((t.name for t in threading.enumerate() if t.ident == ident), str(ident))
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names[ident])
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.profile.disable()
+        self.stopped.set()
+        self.sampler.join()
+        sys.setswitchinterval(self.switch_interval)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.profile.dump_stats(self.prefix + '.pstats')
+        with open(self.prefix + '.collapsed', 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with open(self.prefix + '.tracemalloc.txt', 'w') as f:
+            f.write(f'Traced memory: {current / 1e6:.1f} MB current, {peak / 1e6:.1f} MB peak\n\n')
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f'{stat}\n')
+        with open(self.prefix + '.counters.json', 'w') as f:
+            json.dump(dict(sorted(COUNTERS.items())), f, indent=2)
+
+
+class Metrics:
+    # --metrics: Prometheus counters and per-section latency histograms,
+    # rewritten to a .prom file for node_exporter's textfile collector every
+    # interval seconds and once more at the end. Worker processes keep their
+    # own, without a file, and hand them back with their results (see
+    # report_worker()); labels tell apart the files of several extractors.
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+               10.0)
+    COUNTERS = (
+        ('responses', 'Responses processed, whether or not they failed.'),
+        ('errors', 'Responses whose extraction failed.'),
+        ('files_written', 'Files created or changed.'),
+        ('files_skipped', 'Sections not written: unchanged, empty or excluded.'),
+        ('bytes_in', 'Response bytes scanned.'),
+        ('bytes_out', 'File bytes written.'),
+    )
+    HISTOGRAMS = (
+        ('parse', 'Seconds spent reading and scanning each section.'),
+        ('write', 'Seconds spent writing each file.'),
+    )
+
+    def __init__(self, path=None, labels=None, interval=15.0):
+        self.path = path
+        self.labels = ','.join(
+            '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in (labels or {}).items())
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys((name for name, _ in self.COUNTERS), 0)
+        self.histograms = {name: [[0] * (len(self.BUCKETS) + 1), 0.0] for name, _ in self.HISTOGRAMS}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def count(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                self.counts[name] += value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            buckets = self.histograms[name]
+            buckets[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            buckets[1] += seconds
+
+    def drain(self):
+        with self.lock:
+            state = {'counts': self.counts, 'histograms': self.histograms}
+            self.counts = dict.fromkeys(self.counts, 0)
+            self.histograms = {name: [[0] * (len(self.BUCKETS) + 1), 0.0] for name in self.histograms}
+        return state
+
+    def merge(self, state):
+        with self.lock:
+            for name, value in state['counts'].items():
+                self.counts[name] += value
+            for name, (buckets, total) in state['histograms'].items():
+                mine = self.histograms[name]
+                mine[0] = [a + b for a, b in zip(mine[0], buckets)]
+                mine[1] += total
+
+    def series(self, metric, *labels):
+        labels = ','.join(filter(None, (self.labels, *labels)))
+        return f'{metric}{{{labels}}}' if labels else metric
+
+    def render(self, running):
+        lines = []
+        with self.lock:
+            for name, description in self.COUNTERS:
+                metric = f'astraforge_extract_{name}_total'
+                lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter',
+                          f'{self.series(metric)} {self.counts[name]}']
+            for name, description in self.HISTOGRAMS:
+                metric = f'astraforge_extract_{name}_seconds'
+                buckets, total = self.histograms[name]
+                lines += [f'# HELP {metric} {description}', f'# TYPE {metric} histogram']
+                cumulative = 0
+                for bound, count in zip((*map(repr, self.BUCKETS), '+Inf'), buckets):
+                    cumulative += count
+                    bucket = self.series(metric + '_bucket', f'le="{bound}"')
+                    lines.append(f'{bucket} {cumulative}')
+                lines += [f"{self.series(metric + '_sum')} {total!r}", f"{self.series(metric + '_count')} {cumulative}"]
+        for name, description, value in (
+                ('running', 'Whether the extractor was still running when this file was written.', int(running)),
+                ('last_update_timestamp_seconds', 'When this file was written.', round(time.time(), 3))):
+            metric = f'astraforge_extract_{name}'
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} gauge', f'{self.series(metric)} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def save(self, running=True):
+        # Replaced atomically, as the textfile collector may read it any time
+        with open(self.path + '.tmp', 'w') as f:
+            f.write(self.render(running))
+        os.replace(self.path + '.tmp', self.path)
+
+    def start(self):
+        self.save()
+        self.thread = threading.Thread(target=self.rewrite, name='metrics writer', daemon=True)
+        self.thread.start()
+
+    def rewrite(self):
+        while not self.stopped.wait(self.interval):
+            self.save()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.save(running=False)
+
+
+def enable_metrics(path, labels=None, interval=15.0):
+    global METRICS
+    METRICS = Metrics(path, labels, interval)
+    METRICS.start()
+
+
+class Progress:
+    # --progress: percent done, MB/s, files/s and ETA on stderr, from the
+    # byte offset reached. A thread polls the running Extraction (or the
+    # totals add() is given by batch and shard drivers) every interval
+    # seconds, so the hot path does no extra work. On a terminal the status
+    # line is redrawn in place; otherwise a JSON line is written per update.
+    def __init__(self, stream=None, interval=None):
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.interval = interval or (0.5 if self.tty else 5.0)
+        self.total = None  # Bytes, when known
+        self.bytes = self.files = 0  # Done, not counting the running Extraction
+        self.extraction = None
+        self.offset = 0  # Where the running Extraction started
+        self.started = time.perf_counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.poll, name='progress', daemon=True)
+
+    def attach(self, extraction):
+        self.extraction = extraction
+        self.offset = extraction.end
+
+    def add(self, size, files):
+        self.bytes += size
+        self.files += files
+
+    def poll(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self, final=False):
+        extraction = self.extraction
+        position = scanned = self.bytes
+        files = self.files
+        if extraction is not None:
+            position, scanned = extraction.end, extraction.end - self.offset
+            files = extraction.stats['files'] + extraction.stats['unchanged']
+        seconds = max(time.perf_counter() - self.started, 1e-9)
+        rate = scanned / seconds
+        percent = eta = None
+        if self.total:
+            percent = min(100.0, 100.0 * position / self.total)
+            eta = 0.0 if final else max(0.0, (self.total - position) / rate) if rate else None
+        if self.tty:
+            line = f'{percent:5.1f}%  ' if percent is not None else ''
+            line += f'{position / 1e6:,.1f} MB  {rate / 1e6:.1f} MB/s  {files / seconds:,.0f} files/s'
+            if eta is not None:
+                line += '  ETA {}:{:02d}:{:02d}'.format(int(eta // 3600), int(eta // 60 % 60), int(eta % 60))
+            self.stream.write(f'\r{line}\x1b[K' + ('\n' if final else ''))
+        else:
+            self.stream.write(json.dumps({
+                'event': 'progress', 'final': final, 'bytes': position, 'total': self.total,
+                'percent': None if percent is None else round(percent, 2), 'files': files,
+                'seconds': round(seconds, 3), 'mb_per_s': round(rate / 1e6, 3),
+                'files_per_s': round(files / seconds, 3), 'eta_seconds': None if eta is None else round(eta, 1),
+            }) + '\n')
+        self.stream.flush()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        # Before anything else is printed; later calls do nothing
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.report(final=True)
+
+
+def enable_progress():
+    global PROGRESS
+    PROGRESS = Progress()
+    PROGRESS.start()
+
+
+def header_path(match):
+    path = match.group('file')
+    if path is None:
+        path = match.group('sub')
+    if isinstance(path, bytes):
+        path = path.decode('utf-8')
+    # Drop trailing "(description)" notes after the path
+    return path.split(' (')[0].strip()
+
+
+def buffer_view(text):
+    # What section spans are sliced from: the str itself, or a zero-copy
+    # memoryview over bytes-like input
+    return text if isinstance(text, str) else memoryview(text)
+
+
+def data_spans(start, stop):
+    while stop - start > CHUNK_SIZE:
+        yield DATA, start, start + CHUNK_SIZE
+        start += CHUNK_SIZE
+    if stop > start:
+        yield DATA, start, stop
+
+
+class Scanner:
+    # Single linear pass over the response, yielding events as it goes:
+    #   (HEADER, path, offset)  a section for path starts at offset
+    #   (DATA, start, end)      text[start:end] is part of the section body
+    #   (END, lang, offset)     the section is complete at offset
+    # The body is the first fenced block after the header, or the raw text up
+    # to the next header when the section has no fence. Headers inside an
+    # open fence are part of the body. Spans are at most CHUNK_SIZE long, and
+    # a long fenced body is streamed out while its fence is still open.
+    #
+    # All state lives on the object, so a response can be fed in pieces as it
+    # grows; offsets are always absolute positions in the whole response.
+    def __init__(self, binary=True, offset=0):
+        self.grammar = BYTES_GRAMMAR if binary else TEXT_GRAMMAR
+        self.path = None     # File the current section belongs to
+        self.lang = None
+        self.fence = None    # Backtick run that opened the current code block
+        self.start = offset  # Offset where the unsent part of the body starts
+        self.pos = offset    # Offset of the next line to look at
+
+    def keep(self):
+        # Earliest offset the next feed() still needs to see
+        needed = self.start if self.path is not None else self.pos
+        return max(0, min(needed, self.pos - 1))
+
+    def feed(self, text, base=0, final=True, stop=None):
+        # Scan text, which holds the response from offset base onward (at
+        # least from keep()), picking up where the previous call stopped.
+        # Unless final, a trailing partial line is left for the next call.
+        # stop ends the scan early at that offset, which must be a section
+        # boundary. The generator must be run to completion.
+        header_re, fence_re, close_re, newline, hash_mark, ticks, space = self.grammar
+        opening = (ticks[:1], space)
+        path, lang, fence = self.path, self.lang, self.fence
+        start, pos = self.start - base, self.pos - base
+        end = len(text) if stop is None else stop - base
+        while pos < end:
+            if fence is not None:
+                # Inside a code block only a line starting with ```, after
+                # at most 3 spaces, can matter
+                line = text.find(ticks, pos, end)
+                while line >= 0:
+                    first = text.rfind(newline, pos, line) + 1 or pos
+                    if line - first <= 3 and text[first:line] == space * (line - first):
+                        break
+                    line = text.find(newline, line, end)
+                    if line >= 0:
+                        line = text.find(ticks, line + 1, end)
+                if line < 0:
+                    if not final:
+                        # Complete lines so far are body; send them on now
+                        pos = text.rfind(newline, pos, end) + 1 or pos
+                        for kind, first, last in data_spans(start, pos):
+                            yield kind, first + base, last + base
+                        start = pos
+                    break
+                pos = first
+                while pos - start > CHUNK_SIZE:
+                    yield DATA, start + base, start + CHUNK_SIZE + base
+                    start += CHUNK_SIZE
+            eol = text.find(newline, pos, end)
+            if eol < 0:
+                if not final:
+                    break
+                eol = end
             else:
-                # Handle nested like src/ or media/
-                current_file = part.split('### ')[1].strip()
-            content = []
+                eol += 1
+            lead = text[pos:pos + 3]
+            if fence is not None:
+                close = close_re.match(text, pos, eol)
+                if close and len(close.group(1)) >= len(fence):
+                    for kind, first, last in data_spans(start, pos):
+                        yield kind, first + base, last + base
+                    yield END, lang, eol + base
+                    path = fence = None
+            elif lead[:1] == hash_mark and (match := header_re.match(text, pos, eol)):
+                if path is not None:
+                    for kind, first, last in data_spans(start, pos):
+                        yield kind, first + base, last + base
+                    yield END, None, pos + base
+                path, lang, start = header_path(match), None, eol
+                yield HEADER, path, pos + base
+            elif path is not None and lead[:1] in opening and (match := fence_re.match(text, pos, eol)):
+                fence, lang, start = match.group(1), match.group(2) or None, eol
+                if isinstance(lang, bytes):
+                    lang = lang.decode('ascii')
+            pos = eol
+        if final and path is not None:
+            # Unterminated fence or trailing raw section
+            for kind, first, last in data_spans(start, end):
+                yield kind, first + base, last + base
+            yield END, lang, end + base
+            path = fence = None
+            start = pos = end
+        self.path, self.lang, self.fence = path, lang, fence
+        self.start, self.pos = start + base, pos + base
+
+
+def scan(text):
+    # Scanner events for a whole response held in memory
+    return Scanner(binary=not isinstance(text, str)).feed(text)
+
+
+class ExtractedFile:
+    # One parsed section: the file it belongs to, its fence language and the
+    # span of its body, whitespace-trimmed, in the source (byte offsets for
+    # bytes-like sources, str indices for text). offset is where its header
+    # starts. The body is only sliced out of the source when asked for.
+    __slots__ = ('path', 'language', 'offset', 'start', 'end', 'source')
+
+    def __init__(self, path, language, offset, start, end, source):
+        self.path = path
+        self.language = language
+        self.offset = offset
+        self.start = start
+        self.end = end
+        self.source = source
+
+    def __repr__(self):
+        return f'ExtractedFile({self.path!r}, language={self.language!r}, span={self.span})'
+
+    @property
+    def span(self):
+        return self.start, self.end
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+    @property
+    def body(self):
+        # A memoryview into bytes-like sources, a str for text
+        return buffer_view(self.source)[self.start:self.end]
+
+    def text(self):
+        body = self.body
+        return body if isinstance(body, str) else str(body, 'utf-8')
+
+    def chunks(self):
+        view = buffer_view(self.source)
+        for start in range(self.start, self.end, CHUNK_SIZE):
+            yield view[start:min(start + CHUNK_SIZE, self.end)]
+
+
+def iter_sections(source):
+    # ExtractedFile for every section of a response held in memory (str,
+    # bytes, mmap...), in input order and without any disk I/O. Sections
+    # with an empty body, such as "### path (as above)", are included.
+    for kind, value, offset in scan(source):
+        if kind == HEADER:
+            path, header, first, last = value, offset, None, None
+        elif kind == DATA:
+            if first is None:
+                first = value
+            last = offset
+        else:
+            if first is None:
+                first = last = offset
+            first, last = content_bounds(source, first, last)
+            yield ExtractedFile(path, value, header, first, last, source)
+
+
+def section_events(sections):
+    # extract_events() input for ExtractedFile records
+    for section in sections:
+        yield HEADER, section.path, section.offset
+        offset = section.start
+        for chunk in section.chunks():
+            offset += len(chunk)
+            yield DATA, chunk, offset
+        yield END, section.language, section.end
+
+
+def content_bounds(chunk, first=0, last=None):
+    # Narrow chunk[first:last] to its content without surrounding whitespace,
+    # measuring by index so nothing is copied; same rules as str.strip()
+    if last is None:
+        last = len(chunk)
+    if isinstance(chunk, str):
+        while first < last and chunk[first].isspace():
+            first += 1
+        while last > first and chunk[last - 1].isspace():
+            last -= 1
+        return first, last
+    while first < last and chunk[first] in WHITESPACE:
+        first += 1
+    while last > first and chunk[last - 1] in WHITESPACE:
+        last -= 1
+    return first, last
+
+
+class SectionWriter:
+    # Streams one section body to file_path as its chunks arrive, with the
+    # same result as writing the whole body .strip()ped. The file is opened on
+    # the first non-whitespace chunk, so header-only "(as above)" sections
+    # never truncate an earlier copy; trailing whitespace is held back until
+    # more content follows it. Text chunks are written as UTF-8.
+    #
+    # With skip_unchanged, an existing file is read alongside the incoming
+    # body and only written from the first byte that differs, so a file
+    # whose content is identical is never touched and keeps its mtime.
+    #
+    # With a committer the body goes to a temporary sibling instead, which
+    # the committer renames over file_path once it is complete, so a crash
+    # never leaves a truncated file behind. A file with other hard links
+    # (such as one linked from a --store) is always replaced that way,
+    # never written through.
+    #
+    # With hashed, the SHA-256 of the body is kept in self.digest.
+    def __init__(self, file_path, skip_unchanged=False, committer=None, directories=None, hashed=False):
+        self.file_path = file_path
+        self.skip_unchanged = skip_unchanged
+        self.committer = committer
+        self.directories = directories or DirectoryCache()
+        self.digest = hashlib.sha256() if hashed else None
+        self.offset = None   # Offset of the section's header in the response
+        self.seconds = 0.0   # Time spent writing, as measured by the driver
+        self.temp_path = None
+        self.in_place = committer is None  # Writes go to file_path itself
+        self.file = None
+        self.pending = b''
+        self.size = 0        # Bytes of body so far
+        self.changed = True  # False while the body still matches the old file
+
+    def write(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        first, last = content_bounds(chunk)
+        if first == last:
+            if self.file is not None:
+                self.pending += chunk
+            return
+        if self.file is None:
+            self.open()
+            chunk, last = chunk[first:], last - first
+        elif self.pending:
+            self.emit(self.pending)
+        self.emit(chunk[:last])
+        self.pending = bytes(chunk[last:])
+
+    def open(self):
+        self.directories.ensure(os.path.dirname(self.file_path))
+        if self.committer is not None:
+            self.committer.settle(self.file_path)
+        try:
+            st = os.stat(self.file_path)
+        except OSError:
+            st = None
+        if st is not None and st.st_nlink > 1:
+            self.in_place = False
+        if self.skip_unchanged and st is not None and stat.S_ISREG(st.st_mode):
+            self.file = open(self.file_path, 'r+b' if self.in_place else 'rb')
+            self.changed = False
+        elif self.in_place:
+            self.file = open(self.file_path, 'wb')
         else:
-            # Accumulate content, assuming code blocks follow
-            code_match = re.search(r'```(?:\w+)?\n(.*?)```', part, re.DOTALL)
-            if code_match:
-                content.append(code_match.group(1))
+            self.open_temp()
+
+    def open_temp(self):
+        directory, name = os.path.split(self.file_path)
+        self.temp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{next(TEMP_IDS)}.tmp')
+        self.file = open(self.temp_path, 'xb')
+
+    def diverge(self):
+        # The body stopped matching the old file: write from here on
+        self.changed = True
+        if self.in_place:
+            self.file.seek(self.size)
+            return
+        old = self.file
+        self.open_temp()
+        old.seek(0)
+        remaining = self.size
+        while remaining:
+            remaining -= self.file.write(old.read(min(remaining, CHUNK_SIZE)))
+        old.close()
+
+    def emit(self, data):
+        if self.digest is not None:
+            self.digest.update(data)
+        if not self.changed:
+            if self.file.read(len(data)) == data:
+                self.size += len(data)
+                return
+            self.diverge()
+        self.size += self.file.write(data)
+
+    def close(self):
+        # True if the section had a body; self.changed tells whether the file
+        # on disk was modified for it
+        if self.file is None:
+            return False
+        if not self.changed and self.file.read(1):
+            self.diverge()  # Old file was longer
+        if self.changed and self.skip_unchanged and self.in_place:
+            self.file.truncate(self.size)
+        if self.changed and self.committer is not None:
+            self.committer.add(self.file, self.temp_path, self.file_path)
+        else:
+            self.file.close()
+            if self.changed and self.temp_path is not None:
+                os.replace(self.temp_path, self.file_path)
+        return True
+
+    def abort(self):
+        # Give up on a section that was cut short by an error
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+            if self.temp_path is not None:
+                os.remove(self.temp_path)
+
+
+class ArchiveWriter(SectionWriter):
+    # SectionWriter that collects the body in memory and adds it to an
+    # ArchiveSink or FastImportSink as `name` once the section is complete
+    def __init__(self, file_path, archive, name, hashed=False):
+        super().__init__(file_path, hashed=hashed)
+        self.archive = archive
+        self.name = name
+
+    def open(self):
+        self.file = io.BytesIO()
+
+    def close(self):
+        if self.file is None:
+            return False
+        self.archive.add(self.name, self.file.getvalue())
+        self.file.close()
+        return True
+
+
+class ArchiveSink:
+    # Zip or tar archive that extracted files go straight into instead of
+    # the working tree. The format follows the target's name: .zip, .tar.gz
+    # or .tgz, .tar, or - for an uncompressed tar stream on stdout. A path
+    # that comes up again later in the response is added again, and
+    # extracting the archive keeps the later copy, as writing the tree
+    # would. Safe to share between writer threads.
+    def __init__(self, target):
+        self.target = target
+        self.mtime = time.time()
+        self.lock = threading.Lock()
+        self.zip = self.tar = None
+        if target == '-':
+            self.tar = tarfile.open(fileobj=sys.stdout.buffer, mode='w|')
+        elif target.endswith('.zip'):
+            self.zip = zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED)
+        elif target.endswith(('.tar.gz', '.tgz')):
+            self.tar = tarfile.open(target, 'w:gz', compresslevel=6)
+        elif target.endswith('.tar'):
+            self.tar = tarfile.open(target, 'w')
+        else:
+            raise ValueError(f'unknown archive format: {target}')
+
+    def add(self, name, data):
+        with self.lock:
+            if self.zip is not None:
+                info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')  # Duplicate name
+                    self.zip.writestr(info, data)
             else:
-                content.append(part)  # Fallback for non-code
-
-    # Save last file
-    if current_file and content:
-        file_path = os.path.join(output_dir, current_file)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(content).strip())
-        log.append(f'Created: {file_path}')
-
-    # Log output
-    with open(os.path.join(output_dir, 'extraction_log.txt'), 'w') as f:
-        f.write('\n'.join(log))
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = self.mtime
+                info.mode = 0o644
+                self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        with self.lock:
+            (self.zip or self.tar).close()
+
+    # What was completed before an error is kept
+    abort = close
+
+
+def member_name(path):
+    # Header path as a name relative to the output root: normalized, with
+    # forward slashes. None if it names no file or would end up outside the
+    # root (absolute, a drive, or climbing out with ..).
+    name = posixpath.normpath(path.replace('\\', '/'))
+    if name in ('.', '..') or name.startswith(('/', '../')) or re.match(r'[A-Za-z]:', name):
+        return None
+    return name
+
+
+def git_quote(path):
+    # Path as fast-import reads it: C-style quoted if it needs to be
+    if not path.startswith('"') and '\n' not in path:
+        return path
+    return '"' + path.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+class FastImportSink:
+    # Feeds extracted files to `git fast-import` in repo, so the extraction
+    # becomes one commit on branch, a snapshot of the whole generated tree
+    # on top of the branch's previous tip, without any checkout. Blobs are
+    # streamed as sections complete and the commit naming them is written
+    # by close(). repo is created if it does not exist. Safe to share
+    # between writer threads.
+    def __init__(self, repo, branch='extracted'):
+        if not os.path.exists(repo):
+            subprocess.run(['git', 'init', '-q', repo], check=True)
+        self.branch = branch
+        self.parent = subprocess.run(
+            ['git', '-C', repo, 'rev-parse', '--verify', '-q', f'refs/heads/{branch}^{{commit}}'],
+            capture_output=True, text=True).stdout.strip()
+        ident = subprocess.run(['git', '-C', repo, 'var', 'GIT_COMMITTER_IDENT'], capture_output=True, text=True)
+        self.ident = ident.stdout.strip() if ident.returncode == 0 else None
+        self.process = subprocess.Popen(['git', '-C', repo, 'fast-import', '--quiet'], stdin=subprocess.PIPE)
+        self.stream = self.process.stdin
+        self.marks = itertools.count(1)
+        self.files = {}  # path -> mark of its latest blob
+        self.lock = threading.Lock()
+
+    def add(self, name, data):
+        with self.lock:
+            mark = next(self.marks)
+            self.stream.write(b'blob\nmark :%d\ndata %d\n' % (mark, len(data)))
+            self.stream.write(data)
+            self.stream.write(b'\n')
+            self.files[name] = mark
+
+    def close(self):
+        with self.lock:
+            ident = self.ident or f'AstraForge <astraforge@localhost> {int(time.time())} +0000'
+            message = f'Extract {len(self.files)} files\n'.encode('utf-8')
+            lines = [f'commit refs/heads/{self.branch}', f'committer {ident}', f'data {len(message)}']
+            self.stream.write('\n'.join(lines).encode('utf-8') + b'\n' + message)
+            lines = [f'from {self.parent}'] if self.parent else []
+            lines.append('deleteall')
+            lines += [f'M 100644 :{mark} {git_quote(name)}' for name, mark in sorted(self.files.items())]
+            self.stream.write('\n'.join(lines).encode('utf-8') + b'\n\n')
+            self.finish()
+
+    def abort(self):
+        # No commit: the blobs sent so far are left unreferenced
+        with self.lock:
+            self.finish()
+
+    def finish(self):
+        self.stream.close()
+        if self.process.wait():
+            raise OSError(f'git fast-import exited with status {self.process.returncode}')
+
+
+class BlobWriter(SectionWriter):
+    # SectionWriter that writes the body into a BlobStore, hashing it on the
+    # way, and then puts a link to the blob at file_path
+    def __init__(self, file_path, store, directories=None):
+        super().__init__(file_path, directories=directories, hashed=True)
+        self.store = store
+
+    def open(self):
+        self.directories.ensure(os.path.dirname(self.file_path))
+        self.temp_path = self.store.temp_path()
+        self.file = open(self.temp_path, 'xb')
+
+    def close(self):
+        if self.file is None:
+            return False
+        self.file.close()
+        digest = self.digest.hexdigest()
+        self.store.put(self.temp_path, digest, self.size)
+        self.changed = self.store.materialize(digest, self.file_path)
+        return True
+
+
+def clone_file(source, target):
+    # Copy-on-write clone where the filesystem supports it (btrfs, XFS),
+    # otherwise a plain copy
+    with open(source, 'rb') as src, open(target, 'xb') as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+class BlobStore:
+    # Content-addressed store shared between runs: each distinct body is kept
+    # once, read-only, under objects/ab/cdef... by its SHA-256, and output
+    # files are hardlinks to it, reflinks (copy-on-write clones) or, where
+    # neither works, copies. A hardlinked file is the blob itself and stays
+    # read-only; one that already links to the right blob is left alone.
+    # Each run records the tree it produced as a manifest of path -> hash
+    # under manifests/. Safe to share between threads and processes.
+    def __init__(self, root, link='hardlink'):
+        self.root = root
+        self.link = link
+        self.files = {}
+        self.new_blobs = self.new_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+    def temp_path(self):
+        return os.path.join(self.root, 'tmp', f'{os.getpid()}.{next(TEMP_IDS)}')
+
+    def put(self, temp_path, digest, size):
+        blob = self.blob_path(digest)
+        try:
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.chmod(temp_path, 0o444)
+                os.link(temp_path, blob)
+                with self.lock:
+                    self.new_blobs += 1
+                    self.new_bytes += size
+        except FileExistsError:
+            pass  # Stored meanwhile by another writer
+        finally:
+            os.remove(temp_path)
+
+    def materialize(self, digest, path):
+        # Put the blob at path; False if it was already there
+        blob = self.blob_path(digest)
+        with self.lock:
+            self.files[path] = digest
+        if self.link == 'hardlink':
+            try:
+                if os.path.samefile(blob, path):
+                    return False
+            except FileNotFoundError:
+                pass
+        directory, name = os.path.split(path)
+        temp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{next(TEMP_IDS)}.tmp')
+        if self.link == 'copy':
+            shutil.copyfile(blob, temp_path)
+        elif self.link == 'reflink':
+            clone_file(blob, temp_path)
+        else:
+            try:
+                os.link(blob, temp_path)
+            except OSError:  # Output on another filesystem
+                clone_file(blob, temp_path)
+        os.replace(temp_path, path)
+        return True
+
+    def save_manifest(self, output_dir):
+        manifest = {
+            'output_dir': output_dir, 'created': time.time(), 'link': self.link,
+            'new_blobs': self.new_blobs, 'new_bytes': self.new_bytes,
+            'files': {os.path.relpath(path, output_dir).replace(os.sep, '/'): digest
+                      for path, digest in self.files.items()},
+        }
+        directory = os.path.join(self.root, 'manifests')
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(TEMP_IDS)}.json"
+        with open(os.path.join(directory, name), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+class DirectoryCache:
+    # Directories known to exist, so a run over thousands of files in a few
+    # directories calls os.makedirs once per directory instead of per file
+    def __init__(self):
+        self.known = set()
+
+    def ensure(self, directory):
+        if directory not in self.known:
+            started = time.perf_counter()
+            os.makedirs(directory, exist_ok=True)
+            self.known.add(directory)
+            if COUNTERS is not None:
+                COUNTERS['makedirs_calls'] += 1
+            if TRACER is not None:
+                TRACER.span('makedirs', started, directory=directory)
+
+    def prune(self):
+        # Forget directories removed since they were made; for a cache kept
+        # from one extraction to the next
+        self.known = {directory for directory in self.known if os.path.isdir(directory)}
+
+
+def write_section(writer, chunks, close=True):
+    # Runs chunks of a section, by default all that is left of it, through
+    # its writer; used on writer threads
+    started = time.perf_counter()
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+        return writer.close() if close else None
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        ended = time.perf_counter()
+        writer.seconds += ended - started
+        if TRACER is not None:
+            TRACER.span('write', started, ended, path=writer.file_path, bytes=writer.size)
+
+
+class Committer:
+    # Puts SectionWriter temp files in place with os.replace(). When durable,
+    # each file is fsynced before its rename and every directory that gained
+    # an entry is fsynced after. Renames are held back until `group` files
+    # are waiting, so each directory is synced once per group rather than
+    # once per file; flush() commits whatever is pending. Safe to share
+    # between writer threads.
+    #
+    # A rename that fails does not stop the others in its group; its temp
+    # file is removed, failed is set for good and flush() raises the first
+    # error once the group is done.
+    def __init__(self, durable=False, group=1):
+        self.durable = durable
+        self.group = max(1, group)
+        self.pending = {}  # path -> temp path, in the order they were added
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def settle(self, path):
+        # Commit now if path has a rename pending, so a writer about to open
+        # it sees the content an earlier section gave it
+        with self.lock:
+            pending = path in self.pending
+        if pending:
+            self.flush()
+
+    def add(self, file, temp_path, path):
+        if self.durable:
+            file.flush()
+            os.fsync(file.fileno())
+        file.close()
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        # Keep the mode of the file replaced, unless it is a link into a
+        # BlobStore, whose read-only blobs the file is now cut loose from
+        if st is not None and st.st_nlink == 1:
+            os.chmod(temp_path, st.st_mode & 0o7777)
+        with self.lock:
+            self.pending[path] = temp_path
+            if len(self.pending) < self.group:
+                return
+        self.flush()
+
+    def flush(self):
+        started = time.perf_counter()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        directories = set()
+        error = None
+        for path, temp_path in pending.items():
+            try:
+                os.replace(temp_path, path)
+            except OSError as e:
+                self.failed = True
+                error = error or e
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                continue
+            directories.add(os.path.dirname(path))
+        if self.durable and os.name != 'nt':  # Windows cannot open a directory to sync it
+            for directory in directories:
+                fd = os.open(directory or '.', os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        if TRACER is not None and pending:
+            TRACER.span('commit', started, files=len(pending), directories=len(directories))
+        if error is not None:
+            raise error
+
+
+def read_events(text, offset=0, base=0, stop=None):
+    # scan() events with each DATA span replaced by its chunk of the input.
+    # text holds the response from offset base onward; scanning runs from
+    # offset to stop, both of which must be section boundaries (see
+    # Checkpoint and plan_shards()).
+    view = buffer_view(text)
+    scanner = Scanner(binary=not isinstance(text, str), offset=offset)
+    for kind, value, offset in scanner.feed(text, base, stop=stop):
+        if kind == DATA:
+            yield kind, view[value - base:offset - base], offset
+        else:
+            yield kind, value, offset
+
+
+def mapped_events(response_path, offset=0):
+    # read_events() over a memory map of the response file, so the scan runs
+    # straight from the page cache and pages before offset are never touched
+    with open(response_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > offset:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # The map is released with the last view handed out
+            yield from read_events(mapped, offset)
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'astraforge-extract')
+
+
+class ParseCache:
+    # scan() events of responses already seen, stored in directory under the
+    # SHA-256 of the response and PARSER_VERSION, so an unchanged response
+    # is extracted again by replaying its byte spans without scanning
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+
+    def path(self, digest):
+        return os.path.join(self.directory, f'{digest}.v{PARSER_VERSION}.json')
+
+    def load(self, digest):
+        try:
+            with open(self.path(digest)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, digest, events):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{self.path(digest)}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(events, f, separators=(',', ':'))
+        os.replace(temp_path, self.path(digest))
+
+
+def cached_events(response_path, cache, offset=0):
+    # mapped_events(), with the scan looked up in a ParseCache first and
+    # stored there after a miss. A resumed run replays from the first
+    # section at or after offset.
+    with open(response_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= offset:
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    digest = hashlib.sha256(mapped).hexdigest()
+    events = cache.load(digest)
+    if events is None:
+        events = list(Scanner().feed(mapped))
+        cache.save(digest, events)
+    view = memoryview(mapped)
+    started = not offset
+    for kind, value, end in events:
+        if not started:
+            if kind != HEADER or end < offset:
+                continue
+            started = True
+        if kind == DATA:
+            yield kind, view[value:end], end
+        else:
+            yield kind, value, end
+
+
+class ChunkScanner:
+    # Scanner for a response that arrives in chunks (a growing file, a pipe,
+    # a socket). Only the bytes the scanner still needs are kept between
+    # chunks, and DATA spans are handed out as views of them.
+    def __init__(self, offset=0):
+        self.scanner = Scanner(offset=offset)
+        self.buf = b''
+        self.base = offset
+
+    def feed(self, data, final=False):
+        # The scanner may ask to look one byte back from where it starts,
+        # before the first byte held here
+        keep = max(self.scanner.keep(), self.base)
+        self.buf, self.base = self.buf[keep - self.base:] + data, keep
+        buf, base = self.buf, self.base
+        view = memoryview(buf)
+        for kind, value, offset in self.scanner.feed(buf, base, final):
+            if kind == DATA:
+                yield kind, view[value - base:offset - base], offset
+            else:
+                yield kind, value, offset
+
+
+def follow_events(response_path, offset=0, poll_interval=0.5, idle_timeout=30.0):
+    # Like read_events(), but tails a response file that is still being
+    # written: each section is emitted as soon as its fence closes. Stops
+    # once the file has not grown for idle_timeout seconds.
+    scanner = ChunkScanner(offset)
+    last_growth = time.monotonic()
+    with open(response_path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if data:
+                last_growth = time.monotonic()
+            elif time.monotonic() - last_growth < idle_timeout:
+                time.sleep(poll_interval)
+                continue
+            yield from scanner.feed(data, final=not data)
+            if not data:
+                return
+
+
+class Checkpoint:
+    # Progress marker kept in the output directory while a response file is
+    # extracted, so an interrupted run can continue with --resume. It records
+    # the identity of the response, the byte offset just past the last
+    # completed section and the length of extraction_log.txt at that point.
+    # The scanner is idle at a section boundary, so the offset is all of its
+    # state. Saves are throttled to one per interval seconds.
+    #
+    # With append, a finished run also leaves a marker for the next one: the
+    # boundary before its last section (which appended text may still
+    # extend), with the SHA-256 of the response up to there. If the response
+    # has only grown since, load_appended() picks up from that boundary. The
+    # file that last section wrote is noted as held: if the run that picks
+    # up never writes it again, the section was cut short, and extract_path()
+    # gives the file back the content the sections before it left.
+    FILE_NAME = '.extraction_checkpoint.json'
+    APPEND_FILE_NAME = '.extraction_append.json'
+    WINDOW = 1024  # Bytes hashed at the start of the file and before offset
+
+    def __init__(self, response_path, output_dir, interval=1.0, append=False):
+        self.response_path = os.path.abspath(response_path)
+        self.path = os.path.join(output_dir, self.FILE_NAME)
+        self.append_path = os.path.join(output_dir, self.APPEND_FILE_NAME)
+        self.interval = interval
+        self.append = append
+        self.held = None
+        self.offset = 0
+        self.log_size = 0
+        self.saved_at = time.monotonic()
+
+    def identity(self, offset):
+        with open(self.response_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            head = hashlib.sha256(f.read(self.WINDOW)).hexdigest()
+            f.seek(max(0, offset - self.WINDOW))
+            tail = hashlib.sha256(f.read(min(offset, self.WINDOW))).hexdigest()
+            return {
+                'path': self.response_path, 'dev': st.st_dev, 'ino': st.st_ino,
+                'long_enough': st.st_size >= offset, 'head': head, 'tail': tail,
+            }
+
+    def load(self):
+        # Adopt the saved position if it belongs to this response file
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved['identity'] != self.identity(saved['offset']):
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self.offset, self.log_size = saved['offset'], saved['log_size']
+        return True
+
+    def prefix_digest(self, offset):
+        digest = hashlib.sha256()
+        with open(self.response_path, 'rb') as f:
+            if offset:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view:
+                        digest.update(view[:offset])
+        return digest.hexdigest()
+
+    def load_appended(self):
+        # Adopt where the last finished run left off if the response is
+        # that run's response with text appended
+        try:
+            with open(self.append_path) as f:
+                saved = json.load(f)
+            if (saved['path'] != self.response_path
+                    or os.path.getsize(self.response_path) < saved['offset']
+                    or saved['prefix'] != self.prefix_digest(saved['offset'])):
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self.offset, self.log_size, self.held = saved['offset'], saved['log_size'], saved['held']
+        return True
+
+    def finish(self, boundary):
+        # The run is complete; boundary is (offset, log size, file written)
+        # before its last section
+        self.clear()
+        if self.append:
+            offset, log_size, held = boundary
+            state = {'path': self.response_path, 'offset': offset, 'prefix': self.prefix_digest(offset),
+                     'log_size': log_size, 'held': held}
+            with open(self.append_path + '.tmp', 'w') as f:
+                json.dump(state, f)
+            os.replace(self.append_path + '.tmp', self.append_path)
+
+    def advance(self, offset):
+        # Note a completed section; True when it is time to save
+        self.offset = offset
+        return time.monotonic() - self.saved_at >= self.interval
+
+    def save(self, log, offset=None, log_size=None):
+        # Save the offset reached and the log's length, or the earlier
+        # offset and log_size given
+        started = time.perf_counter()
+        log.flush()
+        if offset is not None:
+            self.offset = offset
+        self.log_size = log.tell() if log_size is None else log_size
+        state = {'identity': self.identity(self.offset), 'offset': self.offset, 'log_size': self.log_size}
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(self.path + '.tmp', self.path)
+        self.saved_at = time.monotonic()
+        if TRACER is not None:
+            TRACER.span('checkpoint', started, offset=self.offset)
+
+    def clear(self):
+        for path in (self.path, self.append_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ManifestIndex:
+    # SQLite database of every file extracted, kept across runs: a row per
+    # run and, per file, the response byte span it came from, its language,
+    # size and SHA-256, indexed by path and by hash. The database is in WAL
+    # mode, so it can be queried while runs (or batch workers) add to it.
+    # Rows are committed with checkpoints, so an interrupted run that is
+    # resumed does not leave duplicates.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY, source TEXT, output_dir TEXT, started REAL, finished REAL,
+            files INTEGER, unchanged INTEGER, bytes INTEGER);
+        CREATE TABLE IF NOT EXISTS files (
+            run_id TEXT, source TEXT, start INTEGER, end INTEGER, path TEXT, language TEXT,
+            size INTEGER, sha256 TEXT, changed INTEGER, created REAL);
+        CREATE INDEX IF NOT EXISTS files_path ON files (path);
+        CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+    """
+
+    def __init__(self, path, source=None, output_dir=None, run_id=None, db=None):
+        # db is a connection from connect() to use and leave open
+        self.owned = db is None
+        self.db = self.connect(path) if db is None else db
+        self.run_id = run_id or uuid.uuid4().hex
+        self.source = source
+        self.rows = []
+        with self.db:
+            self.db.execute('INSERT OR IGNORE INTO runs (run_id, source, output_dir, started) VALUES (?, ?, ?, ?)',
+                            (self.run_id, source, output_dir, time.time()))
+
+    @classmethod
+    def connect(cls, path):
+        db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.executescript(cls.SCHEMA)
+        return db
+
+    def add(self, start, end, path, language, size, digest, changed):
+        self.rows.append((self.run_id, self.source, start, end, path, language, size, digest, changed, time.time()))
+
+    def commit(self):
+        with self.db:
+            self.db.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self.rows)
+        self.rows = []
+
+    def close(self, stats=None):
+        self.commit()
+        if stats is not None:
+            with self.db:
+                # Shards of one run add up
+                self.db.execute(
+                    'UPDATE runs SET finished = ?, files = coalesce(files, 0) + ?, '
+                    'unchanged = coalesce(unchanged, 0) + ?, bytes = coalesce(bytes, 0) + ? WHERE run_id = ?',
+                    (time.time(), stats['files'], stats['unchanged'], stats['bytes'], self.run_id))
+        if self.owned:
+            self.db.close()
+
+
+class WriterOptions:
+    # How an Extraction writes its files:
+    #   skip_unchanged       leave files whose content is unchanged alone
+    #   atomic, fsync and group_commit
+    #                        write through a Committer: temp files renamed
+    #                        into place group_commit at a time, fsynced first
+    #                        with fsync
+    #   threads              size of extract_events()' writer thread pool
+    #   archive              ArchiveSink target that takes the files and the
+    #                        log in place of output_dir
+    #   git and branch       the same for a FastImportSink
+    #   store and link       BlobStore that the files are linked from
+    #   index, source and run_id
+    #                        ManifestIndex the files are recorded in; index_db
+    #                        is an open connection to it to reuse
+    #   json_log             path of a JSON-lines log with an event per section
+    #                        and a closing summary (True for
+    #                        extraction_log.jsonl in output_dir)
+    #   directories          DirectoryCache to reuse
+    __slots__ = ('skip_unchanged', 'atomic', 'fsync', 'group_commit', 'threads', 'archive', 'git', 'branch',
+                 'store', 'link', 'index', 'index_db', 'source', 'run_id', 'json_log', 'directories')
+
+    def __init__(self, *, skip_unchanged=False, atomic=False, fsync=False, group_commit=1, threads=0,
+                 archive=None, git=None, branch='extracted', store=None, link='hardlink', index=None,
+                 index_db=None, source=None, run_id=None, json_log=None, directories=None):
+        self.skip_unchanged = skip_unchanged
+        self.atomic = atomic
+        self.fsync = fsync
+        self.group_commit = group_commit
+        self.threads = threads
+        self.archive = archive
+        self.git = git
+        self.branch = branch
+        self.store = store
+        self.link = link
+        self.index = index
+        self.index_db = index_db
+        self.source = source
+        self.run_id = run_id
+        self.json_log = json_log
+        self.directories = directories
+
+    def __repr__(self):
+        return f'WriterOptions({", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)})'
+
+    def replace(self, **changes):
+        # A copy with the options in changes set
+        return WriterOptions(**{**{name: getattr(self, name) for name in self.__slots__}, **changes})
+
+
+class Extraction:
+    # Bookkeeping for one extraction into output_dir, shared by the sync and
+    # async drivers: the traceability log, stats, checkpoint and Committer,
+    # and a SectionWriter per section. Paths in skip (normalized, see
+    # member_name()) are left out, and the files are written as
+    # writer_options (WriterOptions) say. Without a
+    # checkpoint, the events start at offset start.
+    def __init__(self, output_dir='astraforge-ide', echo=False, checkpoint=None, log_path=None,
+                 skip=frozenset(), writer_options=None, start=0):
+        options = writer_options or WriterOptions()
+        self.store = BlobStore(options.store, options.link) if options.store else None
+        self.index = None
+        if options.index:
+            self.index = ManifestIndex(options.index, options.source, output_dir, options.run_id, options.index_db)
+        json_log = options.json_log
+        if json_log is True:
+            json_log = os.path.join(output_dir, 'extraction_log.jsonl')
+        self.output_dir = output_dir
+        self.prefix_length = len(os.path.join(output_dir, ''))
+        self.echo = echo
+        self.checkpoint = checkpoint
+        self.skip = skip
+        self.archive = None
+        self.output = sys.stdout
+        if options.archive is not None:
+            # Members are named as the files would be under output_dir
+            self.archive = ArchiveSink(options.archive)
+            self.prefix = os.path.basename(os.path.normpath(output_dir)) + '/'
+            self.log = io.StringIO()
+            if options.archive == '-':
+                self.output = sys.stderr
+        elif options.git is not None:
+            self.archive = FastImportSink(options.git, options.branch)
+            self.prefix = ''
+            self.log = io.StringIO()
+        else:
+            # Create output dir if not exists
+            os.makedirs(output_dir, exist_ok=True)
+
+            # Traceability log, written as files are created. A resumed run
+            # keeps the entries up to its checkpoint.
+            log_path = log_path or os.path.join(output_dir, 'extraction_log.txt')
+            if checkpoint is not None and checkpoint.offset:
+                with open(log_path, 'a') as log:
+                    log.truncate(checkpoint.log_size)
+                self.log = open(log_path, 'a')
+            else:
+                self.log = open(log_path, 'w')
+
+        self.threads = options.threads
+        self.committer = Committer(options.fsync, options.group_commit) if options.atomic else None
+        self.directories = options.directories or DirectoryCache()
+        self.skip_unchanged = options.skip_unchanged
+        self.stats = {'files': 0, 'bytes': 0, 'unchanged': 0}
+        # A resumed run adds its events and summary after the earlier runs'
+        self.json_log = None
+        if json_log:
+            self.json_log = open(json_log, 'a' if checkpoint is not None and checkpoint.offset else 'w')
+        # End of the last section recorded, and (offset, log size, file
+        # written) before it
+        self.end = checkpoint.offset if checkpoint is not None else start
+        self.boundary = (self.end, self.log.tell(), None)
+        # (offset, log size) of the last checkpoint saved with every file
+        # before it in place
+        self.saved = self.boundary[:2]
+        # For the JSON log: the time spent producing each section's events,
+        # in input order (see timed()), and totals for the summary
+        self.sections = 0
+        self.started = time.perf_counter()
+        self.first = self.end
+        self.parse_times = collections.deque()
+        self.parse_time = self.parse_total = self.write_total = 0.0
+        if PROGRESS is not None:
+            PROGRESS.attach(self)
+
+    def timed(self, events):
+        # events, noting how long each section took to read and scan when
+        # there is a JSON log or --metrics to report it in, and counting the
+        # body fragments handed out under --profile
+        if self.json_log is None and COUNTERS is None and METRICS is None:
+            return events
+        return self.time_events(events)
+
+    def time_events(self, events):
+        clock = time.perf_counter
+        events = iter(events)
+        while True:
+            started = clock()
+            event = next(events, None)
+            self.parse_time += clock() - started
+            if event is None:
+                return
+            if COUNTERS is not None and event[0] == DATA:
+                COUNTERS['fragments'] += 1
+            if event[0] == END:
+                self.parse_times.append(self.parse_time)
+                self.parse_total += self.parse_time
+                self.parse_time = 0.0
+            yield event
+
+    def writer(self, path, offset=None):
+        # SectionWriter for a section of path whose header is at offset, or
+        # None if it is skipped
+        name = member_name(path)
+        if name is None:
+            print(f'Skipped: {path!r} is not a path inside the output', file=sys.stderr)
+            return None
+        if name in self.skip:
+            return None
+        # Every writer goes by the normalized name, so two spellings of one
+        # path are one file to the Committer, thread pool and checkpoint
+        file_path = os.path.join(self.output_dir, name)
+        hashed = self.index is not None
+        if self.archive is not None:
+            writer = ArchiveWriter(file_path, self.archive, self.prefix + name, hashed)
+        elif self.store is not None:
+            writer = BlobWriter(file_path, self.store, self.directories)
+        else:
+            writer = SectionWriter(file_path, self.skip_unchanged, self.committer,
+                                   directories=self.directories, hashed=hashed)
+        writer.offset = offset
+        return writer
+
+    def record(self, writer, written, offset, language=None):
+        # Account for a finished section ending at offset; called in input
+        # order
+        log_size = self.log.tell()
+        self.boundary = (self.end, log_size, writer.file_path if writer is not None else None)
+        self.end = offset
+        if written:
+            if self.checkpoint is not None and writer.file_path == self.checkpoint.held:
+                self.checkpoint.held = None
+            if writer.changed:
+                self.stats['files'] += 1
+                self.stats['bytes'] += writer.size
+                entry = f'Created: {writer.file_path}'
+            else:
+                self.stats['unchanged'] += 1
+                entry = f'Unchanged: {writer.file_path}'
+            self.log.write(f'\n{entry}' if log_size else entry)
+            if self.echo:
+                print(entry, file=self.output, flush=True)
+            if self.index is not None:
+                self.index.add(writer.offset, offset, writer.file_path[self.prefix_length:], language or None,
+                               writer.size, writer.digest.hexdigest(), writer.changed)
+        parse_seconds = self.parse_times.popleft() if self.parse_times else 0.0
+        if self.json_log is not None:
+            self.log_event(writer, written, offset, language, parse_seconds)
+        if METRICS is not None:
+            METRICS.observe('parse', parse_seconds)
+            if written:
+                METRICS.observe('write', writer.seconds)
+            scanned = offset - self.boundary[0]
+            if written and writer.changed:
+                METRICS.count(files_written=1, bytes_out=writer.size, bytes_in=scanned)
+            else:
+                METRICS.count(files_skipped=1, bytes_in=scanned)
+        if COUNTERS is not None:
+            COUNTERS['sections'] += 1
+            COUNTERS['writes_skipped' if not written or not writer.changed else 'files_written'] += 1
+        if self.checkpoint is not None and self.checkpoint.advance(offset):
+            if self.committer is not None:
+                self.committer.flush()
+            if self.index is not None:
+                self.index.commit()
+            self.checkpoint.save(self.log)
+            self.saved = (self.checkpoint.offset, self.checkpoint.log_size)
+
+    def log_event(self, writer, written, offset, language, parse_seconds):
+        write_seconds = writer.seconds if writer is not None else 0.0
+        self.write_total += write_seconds
+        reason = None
+        if writer is None:
+            reason = 'excluded'
+        elif not written:
+            reason = 'empty'
+        elif not writer.changed:
+            reason = 'unchanged'
+        event = {
+            'event': 'file', 'index': self.sections,
+            'path': writer.file_path[self.prefix_length:] if writer is not None else None,
+            'language': language or None, 'offset': writer.offset if writer is not None else None, 'end': offset,
+            'bytes': writer.size if written and writer.changed else 0,
+            'parse_seconds': round(parse_seconds, 6), 'write_seconds': round(write_seconds, 6),
+            'skipped': reason is not None, 'reason': reason,
+        }
+        self.sections += 1
+        self.json_log.write(json.dumps(event) + '\n')
+
+    def close_json_log(self, completed=True):
+        if self.json_log is None:
+            return
+        seconds = time.perf_counter() - self.started
+        bytes_in = self.end - self.first
+        summary = {
+            'event': 'summary', 'completed': completed, 'sections': self.sections, **self.stats,
+            'skipped': self.sections - self.stats['files'], 'bytes_in': bytes_in,
+            'seconds': round(seconds, 6), 'parse_seconds': round(self.parse_total, 6),
+            'write_seconds': round(self.write_total, 6),
+            'mb_per_s': round(bytes_in / 1e6 / max(seconds, 1e-9), 3),
+            'files_per_s': round(self.stats['files'] / max(seconds, 1e-9), 3),
+        }
+        self.json_log.write(json.dumps(summary) + '\n')
+        self.json_log.close()
+
+    def close_log(self, aborted=False):
+        if self.archive is not None:
+            self.archive.add(self.prefix + 'extraction_log.txt', self.log.getvalue().encode('utf-8'))
+            self.archive.abort() if aborted else self.archive.close()
+        self.log.close()
+
+    def finish(self):
+        if COUNTERS is not None:
+            COUNTERS['bytes_scanned'] += self.end - self.first
+        if self.committer is not None:
+            try:
+                self.committer.flush()
+            except BaseException:
+                self.abort()
+                raise
+        if self.store is not None:
+            self.store.save_manifest(self.output_dir)
+        if self.index is not None:
+            self.index.close(self.stats)
+        self.close_json_log()
+        self.close_log()
+        if self.checkpoint is not None:
+            self.checkpoint.finish(self.boundary)
+        return self.stats
+
+    def abort(self):
+        # Keep what was completed before an error. The checkpoint is saved
+        # even if committing fails; once a file could not be put in place,
+        # it goes back to the last save with every file before it in place.
+        try:
+            if self.committer is not None:
+                self.committer.flush()
+            if self.index is not None:
+                self.index.close()
+        finally:
+            try:
+                if self.checkpoint is not None:
+                    if self.committer is not None and self.committer.failed:
+                        self.checkpoint.save(self.log, *self.saved)
+                    else:
+                        self.checkpoint.save(self.log)
+            finally:
+                self.close_json_log(completed=False)
+                self.close_log(aborted=True)
+
+
+def extract_events(events, output_dir='astraforge-ide', echo=False, checkpoint=None, log_path=None,
+                   skip=frozenset(), writer_options=None, start=0):
+    # Write the sections in events under output_dir (see Extraction for the
+    # options). Returns counts of the files written and left unchanged and
+    # of the bytes written.
+    extraction = Extraction(output_dir, echo, checkpoint, log_path, skip, writer_options, start)
+    threads = extraction.threads
+    clock = time.perf_counter
+
+    def settle(item):
+        future, writer, offset, language = item
+        if future is None:
+            extraction.record(None, False, offset)
+            return
+        extraction.record(writer, future.result(), offset, language)
+        if latest.get(writer.file_path) is future:
+            del latest[writer.file_path]
+
+    # With threads, each section is handed to a pool as a whole once it is
+    # complete. Finished sections are recorded in input order, a section waits
+    # for an earlier one writing the same path, and at most a few sections
+    # per thread are in flight so the scanner cannot run far ahead. Without
+    # threads, sections are written while they are scanned, except under
+    # --trace, where each is written once scanned so the spans do not mix.
+    pool = ThreadPoolExecutor(threads) if threads else None
+    streaming = pool is None and TRACER is None
+    inflight = collections.deque()  # (future, writer, offset, language) in input order
+    latest = {}  # path -> future of its most recent section
+    writer = chunks = None
+    scan_started = clock()
+    try:
+        for kind, value, offset in extraction.timed(events):
+            if kind == HEADER:
+                writer = extraction.writer(value, offset)
+                chunks = []
+            elif kind == DATA:
+                if writer is None:
+                    pass
+                elif streaming:
+                    started = clock()
+                    writer.write(value)
+                    writer.seconds += clock() - started
+                else:
+                    chunks.append(value)
+            elif pool is None:
+                written = False
+                if writer is None:
+                    pass
+                elif streaming:
+                    started = clock()
+                    written = writer.close()
+                    writer.seconds += clock() - started
+                else:
+                    TRACER.span('scan', scan_started, path=writer.file_path)
+                    written = write_section(writer, chunks)
+                extraction.record(writer, written, offset, value)
+                writer = None
+                scan_started = clock()
+            else:
+                if TRACER is not None:
+                    TRACER.span('scan', scan_started, path=writer.file_path if writer is not None else None)
+                future = None
+                if writer is not None:
+                    earlier = latest.get(writer.file_path)
+                    if earlier is not None:
+                        wait([earlier])
+                    future = latest[writer.file_path] = pool.submit(write_section, writer, chunks)
+                inflight.append((future, writer, offset, value))
+                writer = chunks = None
+                while inflight and (len(inflight) > 4 * threads or inflight[0][0] is None
+                                    or inflight[0][0].done()):
+                    settle(inflight.popleft())
+                scan_started = clock()
+        while inflight:
+            settle(inflight.popleft())
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        extraction.abort()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return extraction.finish()
+
+
+async def extract_stream(reader, output_dir='astraforge-ide', queue_size=8, executor=None, writer_options=None):
+    # asyncio counterpart of extract_events() for a response read from
+    # anything with an async read(n): an asyncio StreamReader for a pipe or
+    # socket, or FileStream for a regular file. Reading, scanning and writing
+    # run as separate tasks joined by bounded queues; every filesystem call,
+    # logging included, goes through executor, so the event loop never
+    # blocks on the disk and a slow disk fills the queues and pauses reading
+    # instead of letting memory grow. Returns the same stats as
+    # extract_events().
+    loop = asyncio.get_running_loop()
+    extraction = await loop.run_in_executor(
+        executor, functools.partial(Extraction, output_dir, writer_options=writer_options))
+    chunks = asyncio.Queue(queue_size)
+    batches = asyncio.Queue(queue_size)
+    # The writer of a section still open between batches, and the batch being
+    # written, for cleaning up after an error
+    writer = writing = None
+
+    async def read():
+        while True:
+            started = time.perf_counter()
+            data = await reader.read(CHUNK_SIZE)
+            if TRACER is not None:
+                TRACER.span('read', started, bytes=len(data))
+            await chunks.put(data)
+            if not data:
+                return
+
+    async def scan_chunks():
+        scanner = ChunkScanner()
+        while True:
+            data = await chunks.get()
+            started = time.perf_counter()
+            batch = list(extraction.timed(scanner.feed(data, final=not data)))
+            if TRACER is not None:
+                TRACER.span('scan', started, bytes=len(data), events=len(batch))
+            await batches.put(batch)
+            if not data:
+                await batches.put(None)
+                return
+
+    def write_batch(work, done):
+        # One executor hop per batch rather than per section: its writes, then
+        # the sections it completes, recorded in input order
+        results = [write_section(writer, chunks, close) for writer, chunks, close in work]
+        for writer_done, index, offset, language in done:
+            extraction.record(writer_done, writer_done is not None and results[index], offset, language)
+
+    async def write():
+        nonlocal writer, writing
+        pending = []
+        while (batch := await batches.get()) is not None:
+            # Each batch turns into a list of writes, done on the executor in
+            # one go, and the sections it completes, recorded after them
+            work, done = [], []
+            for kind, value, offset in batch:
+                if kind == HEADER:
+                    writer, pending = extraction.writer(value, offset), []
+                elif kind == DATA:
+                    if writer is not None:
+                        pending.append(value)
+                else:
+                    if writer is not None:
+                        work.append((writer, pending, True))
+                    done.append((writer, len(work) - 1, offset, value))
+                    writer, pending = None, []
+            if pending:
+                work.append((writer, pending, False))
+                pending = []
+            if work or done:
+                # Shielded, so that on cancellation the batch is still known
+                # to be running until it is done
+                writing = loop.run_in_executor(executor, write_batch, work, done)
+                await asyncio.shield(writing)
+                writing = None
+
+    tasks = [asyncio.ensure_future(stage()) for stage in (read, scan_chunks, write)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        if writing is not None:
+            await asyncio.wait([writing])
+        if writer is not None:
+            await loop.run_in_executor(executor, writer.abort)
+        await loop.run_in_executor(executor, extraction.abort)
+        raise
+    return await loop.run_in_executor(executor, extraction.finish)
+
+
+class FileStream:
+    # Async read(n) over a regular file, reading on an executor; files
+    # cannot be watched by the event loop the way pipes and sockets can
+    def __init__(self, file, executor=None):
+        self.file = file
+        self.executor = executor
+
+    async def read(self, n=-1):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.file.read, n)
+
+
+async def stdin_reader():
+    # Reader for extract_stream() over standard input: a StreamReader when
+    # it is a pipe, FileStream when it is redirected from a file
+    stdin = sys.stdin.buffer
+    if os.name == 'nt' or stat.S_ISREG(os.fstat(stdin.fileno()).st_mode):
+        return FileStream(stdin)
+    reader = asyncio.StreamReader()
+    loop = asyncio.get_running_loop()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stdin)
+    return reader
+
+
+async def extract_stdin(output_dir='astraforge-ide', writer_options=None):
+    return await extract_stream(await stdin_reader(), output_dir, writer_options=writer_options)
+
+
+def extract_files(response_text, output_dir='astraforge-ide'):
+    extract_events(section_events(iter_sections(response_text)), output_dir)
     print('Extraction complete. Check extraction_log.txt for details.')
 
-# Main: Read response.txt and run
-if __name__ == '__main__':
-    # Use the literal path with %TEMP% as a folder name
-    response_path = r"C:\Users\up2it\Desktop\AstraForge\%TEMP%\response.txt"
+
+def extract_path(response_path, output_dir='astraforge-ide', mode='read', resume=False,
+                 idle_timeout=30.0, checkpoint_interval=1.0, writer_options=None, parse_cache=None,
+                 append=False):
+    # Extract a response file with checkpoints. mode is 'read' (load it as
+    # bytes), 'mmap' or 'follow'; with resume, start after the last section
+    # an interrupted run completed. With append, a transcript that has grown
+    # since the last append run is only scanned from where that run's last
+    # section began (see Checkpoint). With a parse_cache directory, a complete
+    # response is scanned through a ParseCache. Returns the extract_events()
+    # stats.
+    # Output to an archive or git has no checkpoints: it is written in one go.
+    writer_options = (writer_options or WriterOptions()).replace(source=os.path.abspath(response_path))
+    checkpoint, offset = None, 0
+    if not writer_options.archive and not writer_options.git:
+        checkpoint = Checkpoint(response_path, output_dir, checkpoint_interval, append)
+        if resume and checkpoint.load():
+            if mode == 'follow':
+                print(f'Resuming at byte {checkpoint.offset}.')
+        elif append and checkpoint.load_appended():
+            if mode == 'follow':
+                print(f'Continuing appended transcript at byte {checkpoint.offset}.')
+        else:
+            checkpoint.clear()
+        offset = checkpoint.offset
+    if mode == 'follow':
+        events = follow_events(response_path, offset, idle_timeout=idle_timeout)
+    elif parse_cache is not None:
+        events = cached_events(response_path, ParseCache(parse_cache), offset)
+    elif mode == 'mmap':
+        events = mapped_events(response_path, offset)
+    else:
+        started = time.perf_counter()
+        with open(response_path, 'rb') as f:
+            f.seek(offset)
+            events = read_events(f.read(), offset, base=offset)
+        if TRACER is not None:
+            TRACER.span('read', started, path=response_path)
+    stats = extract_events(events, output_dir, echo=mode == 'follow', checkpoint=checkpoint,
+                           writer_options=writer_options)
+    if checkpoint is not None and checkpoint.held is not None:
+        restore_file(response_path, output_dir, checkpoint.held, offset)
+    return stats
+
+
+def restore_file(response_path, output_dir, file_path, stop):
+    # Give file_path the content the sections before offset stop left it
+    # with, or remove it, and the directories emptied by that, if none wrote
+    # it
+    written = False
+    with open(response_path, 'rb') as f:
+        if stop:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            writer = None
+            for kind, value, offset in read_events(mapped, stop=stop):
+                if kind == HEADER:
+                    name = member_name(value)
+                    if name is not None and os.path.join(output_dir, name) == file_path:
+                        writer = SectionWriter(file_path, skip_unchanged=True)
+                elif writer is None:
+                    pass
+                elif kind == DATA:
+                    writer.write(value)
+                else:
+                    written = writer.close() or written
+                    writer = None
+    if not written and os.path.isfile(file_path):
+        os.remove(file_path)
+        directory = os.path.dirname(file_path)
+        while os.path.normpath(directory) != os.path.normpath(output_dir) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+
+def shard_cuts(mapped, shards):
+    # Where to try cutting a response into about `shards` byte ranges: the
+    # first header line at or after each even share of its length. Found by
+    # searching for header lines alone, so a cut may turn out to be inside a
+    # fence; plan_shards() checks each one.
+    header_re = BYTES_GRAMMAR[0]
+    size = len(mapped)
+    cuts = [0]
+    for index in range(1, shards):
+        line = mapped.find(b'\n#', max(index * size // shards, cuts[-1] + 1) - 1) + 1
+        while line:
+            if header_re.match(mapped, line, mapped.find(b'\n', line) + 1 or size):
+                cuts.append(line)
+                break
+            line = mapped.find(b'\n#', line) + 1
+        else:
+            break
+    return cuts
+
+
+def plan_job(job):
+    # Scan a response from start, which must be a section boundary, to the
+    # first header at or after stop that is outside any fence: the end of a
+    # shard starting at start. Returns that offset and the paths the shard
+    # gives a non-empty section.
+    response_path, start, stop = job
+    with open(response_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with mapped:
+        view = memoryview(mapped)
+        end, written = len(mapped), set()
+        for kind, value, offset in Scanner(offset=start).feed(mapped):
+            if kind == HEADER:
+                if offset >= stop:
+                    end = offset
+                    break
+                path = member_name(value)
+            elif kind == DATA and path is not None and path not in written:
+                first, last = content_bounds(view[value:offset])
+                if first != last:
+                    written.add(path)
+        view.release()
+    return end, written
+
+
+def plan_shards(response_path, shards, pool=None):
+    # Cut a response into about `shards` byte ranges that can each be
+    # scanned on its own, cutting at header lines outside any open fence.
+    # Also notes which paths a shard writes that a later shard writes again:
+    # the earlier shard leaves those to the later one, as a serial run would.
+    # The ranges between shard_cuts() are scanned in parallel on pool when
+    # given; where a cut turns out to be inside a fence the range before it
+    # runs on to the next header outside one, and the range after that is
+    # scanned again from there. Returns [(start, stop, skip)].
+    with open(response_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            cuts = shard_cuts(mapped, shards) + [size]
+    jobs = [(response_path, start, stop) for start, stop in zip(cuts, cuts[1:])]
+    scans = dict(zip(cuts, pool.map(plan_job, jobs) if pool is not None else map(plan_job, jobs)))
+    ranges, start = [], 0
+    while start < size:
+        stop = cuts[bisect.bisect_right(cuts, start)]
+        end, written = scans.get(start) or plan_job((response_path, start, stop))
+        ranges.append((start, end, written))
+        start = end
+    plan, later = [], set()
+    for start, stop, written in reversed(ranges):
+        plan.append((start, stop, frozenset(written & later)))
+        later.update(written)
+    return plan[::-1]
+
+
+def shard_job(job):
+    # Runs in a worker process: extract one byte range of the response into
+    # the shared output directory, logging to a shard log of its own
+    response_path, output_dir, log_path, start, stop, skip, writer_options = job
+    with open(response_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    started = time.perf_counter()
+    stats = extract_events(read_events(mapped, start, stop=stop), output_dir, log_path=log_path, skip=skip,
+                           writer_options=writer_options, start=start)
+    if TRACER is not None:
+        TRACER.span('shard', started, start=start, stop=stop)
+    report_worker(stats)
+    return stats
+
+
+def worker_setup():
+    # ProcessPoolExecutor arguments that turn on tracing, counters and
+    # metrics in its workers while they are on here
+    if TRACER is None and COUNTERS is None and METRICS is None:
+        return {}
+    return {'initializer': start_worker,
+            'initargs': (TRACER is not None, COUNTERS is not None, METRICS is not None)}
+
+
+def start_worker(trace, count, metrics=False):
+    global METRICS
+    if trace:
+        enable_tracing()
+    if count:
+        enable_counters()
+    if metrics:
+        METRICS = Metrics()
+
+
+def report_worker(result):
+    # Hand a worker's spans, counters and metrics back with its result,
+    # starting afresh for its next job
+    global COUNTERS
+    if TRACER is not None:
+        result['trace'] = TRACER.drain()
+    if COUNTERS is not None:
+        result['counters'], COUNTERS = dict(COUNTERS), collections.Counter()
+    if METRICS is not None:
+        result['metrics'] = METRICS.drain()
+
+
+def collect_worker(result):
+    # Move what report_worker() added to result into this process
+    events = result.pop('trace', None)
+    if events and TRACER is not None:
+        TRACER.events.extend(events)
+    counters = result.pop('counters', None)
+    if counters and COUNTERS is not None:
+        COUNTERS.update(counters)
+    metrics = result.pop('metrics', None)
+    if metrics and METRICS is not None:
+        METRICS.merge(metrics)
+
+
+def extract_sharded(response_path, output_dir='astraforge-ide', shards=None, writer_options=None):
+    # Extract one large response with a worker process per byte range (see
+    # plan_shards()), then merge the shard logs back in input order
+    shards = shards or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    log_path = os.path.join(output_dir, 'extraction_log.txt')
+    # Shards are indexed as one run
+    writer_options = (writer_options or WriterOptions()).replace(source=os.path.abspath(response_path),
+                                                                 run_id=uuid.uuid4().hex)
+    stats = {'files': 0, 'bytes': 0, 'unchanged': 0}
+    with ProcessPoolExecutor(max_workers=shards, **worker_setup()) as pool:
+        started = time.perf_counter()
+        plan = plan_shards(response_path, shards, pool)
+        if TRACER is not None:
+            TRACER.span('plan', started, shards=len(plan))
+        work = [(response_path, output_dir, f'{log_path}.{index:04d}', start, stop, skip, writer_options)
+                for index, (start, stop, skip) in enumerate(plan)]
+        for (start, stop, _), result in zip(plan, pool.map(shard_job, work)):
+            collect_worker(result)
+            for key in stats:
+                stats[key] += result[key]
+            if PROGRESS is not None:
+                PROGRESS.add(stop - start, result['files'] + result['unchanged'])
+    with open(log_path, 'w') as log:
+        for job in work:
+            with open(job[2]) as part:
+                entries = part.read()
+            if entries:
+                log.write(f'\n{entries}' if log.tell() else entries)
+            os.remove(job[2])
+    return stats
+
+
+def find_responses(targets, name='response.txt'):
+    # Response files named by targets: plain files, directories (searched
+    # recursively for files matching name) or glob patterns
+    found = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                dirs.sort()
+                found.extend(os.path.join(root, f) for f in sorted(files) if fnmatch.fnmatch(f, name))
+        elif os.path.isfile(target):
+            found.append(target)
+        else:
+            found.extend(p for p in sorted(glob.glob(target, recursive=True)) if os.path.isfile(p))
+    return list(dict.fromkeys(os.path.abspath(p) for p in found))
+
+
+def output_roots(responses, output_dir):
+    # A separate output root per response: its path relative to the
+    # directory all responses share, without the extension. When every file
+    # has the same name (projectA/response.txt, projectB/response.txt) the
+    # project directories alone are enough. Responses that differ only in
+    # their extension (response.txt, response.md) keep it, as two runs must
+    # never share a root.
+    if not responses:
+        return []
+    base = os.path.commonpath([os.path.dirname(p) for p in responses])
+    rels = [os.path.relpath(p, base) for p in responses]
+    if len({os.path.basename(r) for r in rels}) == 1 and all(os.path.dirname(r) for r in rels):
+        return [os.path.join(output_dir, os.path.dirname(r)) for r in rels]
+    stems = collections.Counter(os.path.splitext(r)[0] for r in rels)
+    roots = [os.path.join(output_dir, r if stems[os.path.splitext(r)[0]] > 1 else os.path.splitext(r)[0])
+             for r in rels]
+    clashes = sorted(root for root, count in collections.Counter(roots).items() if count > 1)
+    if clashes:
+        raise ValueError(f'responses would share an output root: {", ".join(clashes)}')
+    return roots
+
+
+def batch_job(job):
+    # Runs in a worker process; failures are reported, not raised
+    response_path, output_root, mode, resume, append, writer_options, parse_cache = job
+    started = time.perf_counter()
+    result = {'response': response_path, 'output': output_root, 'files': 0, 'bytes': 0, 'unchanged': 0,
+              'error': None}
+    try:
+        result['bytes_in'] = os.path.getsize(response_path)
+        result.update(extract_path(response_path, output_root, mode, resume=resume, writer_options=writer_options,
+                                   parse_cache=parse_cache, append=append))
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['seconds'] = time.perf_counter() - started
+    if TRACER is not None:
+        TRACER.span('response', started, path=response_path)
+    if METRICS is not None:
+        METRICS.count(responses=1, errors=result['error'] is not None)
+    report_worker(result)
+    return result
+
+
+def extract_batch(targets, output_dir='astraforge-ide', mode='read', resume=False, jobs=None,
+                  name='response.txt', writer_options=None, parse_cache=None, append=False):
+    # Extract every response found in targets over a process pool, each into
+    # its own root under output_dir, and summarize the whole run
+    responses = find_responses(targets, name)
+    jobs = jobs or os.cpu_count() or 1
+    work = [(p, root, mode, resume, append, writer_options, parse_cache)
+            for p, root in zip(responses, output_roots(responses, output_dir))]
+    started = time.perf_counter()
+    if PROGRESS is not None:
+        PROGRESS.total = sum(os.path.getsize(p) for p in responses)
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, **worker_setup()) as pool:
+        # Collected as they come in, so --metrics and --progress follow the run
+        for result in pool.map(batch_job, work, chunksize=max(1, len(work) // (jobs * 8))):
+            collect_worker(result)
+            results.append(result)
+            if PROGRESS is not None:
+                PROGRESS.add(result.get('bytes_in', 0), result['files'] + result['unchanged'])
+    elapsed = time.perf_counter() - started
+    if PROGRESS is not None:
+        PROGRESS.stop()
+
+    failed = [r for r in results if r['error']]
+    summary = {
+        'responses': len(results), 'failed': len(failed), 'workers': jobs,
+        'files': sum(r['files'] for r in results), 'bytes': sum(r['bytes'] for r in results),
+        'unchanged': sum(r['unchanged'] for r in results),
+        'bytes_in': sum(r.get('bytes_in', 0) for r in results), 'seconds': elapsed,
+        'results': results,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'batch_summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Batch complete: {len(results) - len(failed)}/{len(results)} responses extracted "
+          f"with {jobs} workers in {elapsed:.1f}s.")
+    print(f"{summary['files']} files created, {summary['unchanged']} unchanged, {summary['bytes_in'] / 1e6:.1f} MB read "
+          f"({summary['bytes_in'] / 1e6 / max(elapsed, 1e-9):.1f} MB/s).")
+    for r in failed:
+        print(f"Failed: {r['response']}: {r['error']}")
+    return summary
+
+
+class Daemon:
+    # --serve: a long-lived extractor answering JSON-lines requests, one per
+    # line, on a Unix domain socket or on stdin/stdout, so a caller such as
+    # WorkflowManager pays for interpreter start-up and grammar compilation
+    # once. Requests are handled one at a time, in arrival order across
+    # clients, and reuse a DirectoryCache per output directory and open
+    # --index databases.
+    #
+    #   {"id": 1, "response": "path/response.txt", "output_dir": "out"}
+    #   {"id": 2, "text": "## File: ...", "output_dir": "out", "incremental": true}
+    #   {"op": "ping"}  {"op": "shutdown"}
+    #
+    # An extract request takes the response as a path or inline text, plus
+    # output_dir and, for a path, mode ("read" or "mmap"), resume and append;
+    # incremental, atomic and fsync override the daemon's defaults. Each
+    # reply carries the request's id and either "ok": true with the
+    # extract_events() stats or "ok": false with an error.
+    REQUEST_LIMIT = 1 << 30  # Longest request line read from a socket
+
+    def __init__(self, writer_options=None, mode='read', parse_cache=None):
+        self.writer_options = writer_options or WriterOptions()
+        self.mode = mode
+        self.parse_cache = parse_cache
+        self.directories = {}  # Output directory -> DirectoryCache
+        self.databases = {}    # --index path -> open connection
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='extract')
+        self.started = time.time()
+        self.requests = 0
+        self.stopping = False
+
+    def respond(self, line):
+        # Reply to one request line
+        started = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be a JSON object')
+            request_id = request.get('id')
+            reply = {'id': request_id, 'ok': True, **self.handle(request)}
+        except Exception as e:
+            reply = {'id': request_id, 'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        reply['seconds'] = round(time.perf_counter() - started, 6)
+        return reply
+
+    def handle(self, request):
+        op = request.get('op', 'extract')
+        if op == 'ping':
+            return {'pid': os.getpid(), 'uptime': round(time.time() - self.started, 3), 'requests': self.requests}
+        if op == 'shutdown':
+            self.stopping = True
+            return {}
+        if op != 'extract':
+            raise ValueError(f'unknown op: {op}')
+        self.requests += 1
+        try:
+            stats = self.extract(request)
+        except Exception:
+            if METRICS is not None:
+                METRICS.count(responses=1, errors=1)
+            raise
+        if METRICS is not None:
+            METRICS.count(responses=1)
+        return stats
+
+    def extract(self, request):
+        output_dir = request.get('output_dir', 'astraforge-ide')
+        options = self.writer_options.replace(**{
+            option: bool(request[key])
+            for key, option in (('incremental', 'skip_unchanged'), ('atomic', 'atomic'), ('fsync', 'fsync'))
+            if key in request})
+        # Directories made for earlier requests may have been removed since
+        directories = self.directories.setdefault(os.path.abspath(output_dir), DirectoryCache())
+        directories.prune()
+        options = options.replace(atomic=options.atomic or options.fsync, directories=directories)
+        if options.index:
+            if options.index not in self.databases:
+                self.databases[options.index] = ManifestIndex.connect(options.index)
+            options = options.replace(index_db=self.databases[options.index])
+        if 'text' in request:
+            data = request['text'].encode('utf-8')
+            return extract_events(read_events(data), output_dir, writer_options=options)
+        if 'response' not in request:
+            raise ValueError('an extract request needs "response" or "text"')
+        mode = request.get('mode', self.mode)
+        if mode not in ('read', 'mmap'):
+            raise ValueError(f'mode must be "read" or "mmap", not {mode!r}')
+        return extract_path(request['response'], output_dir, mode, resume=bool(request.get('resume')),
+                            writer_options=options, parse_cache=self.parse_cache,
+                            append=bool(request.get('append')))
+
+    def serve_stdio(self):
+        # Requests on stdin, replies on stdout; anything else printed goes to
+        # stderr so it cannot corrupt the replies
+        replies, sys.stdout = sys.stdout, sys.stderr
+        try:
+            for line in sys.stdin.buffer:
+                if not line.strip():
+                    continue
+                replies.write(json.dumps(self.respond(line)) + '\n')
+                replies.flush()
+                if self.stopping:
+                    break
+        finally:
+            sys.stdout = replies
+            self.close()
+
+    async def serve_socket(self, path):
+        if os.path.exists(path):
+            # Left behind by a daemon that died, unless one still answers
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.remove(path)
+            else:
+                raise OSError(f'a daemon is already listening on {path}')
+            finally:
+                probe.close()
+        loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        # Only this user may connect
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.client, path, limit=self.REQUEST_LIMIT)
+        finally:
+            os.umask(umask)
+        try:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, self.stopped.set)
+            print(f'Listening on {path}.', file=sys.stderr, flush=True)
+            async with server:
+                await self.stopped.wait()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+            self.close()
+
+    async def client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                reply = await loop.run_in_executor(self.executor, self.respond, line)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+                if self.stopping:
+                    self.stopped.set()
+                    break
+        except (ValueError, ConnectionError) as e:
+            # ValueError: a line longer than REQUEST_LIMIT
+            print(f'Client dropped: {e}', file=sys.stderr)
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown()
+        for db in self.databases.values():
+            db.close()
+        self.databases.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract generated project files from an LLM response.')
+    parser.add_argument('responses', nargs='*', metavar='response',
+                        help="path to response.txt, or - to read it from stdin; with --batch, files, "
+                             "directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', default='astraforge-ide')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--mmap', action='store_true', help='memory-map the response and scan it as bytes')
+    source.add_argument('--follow', action='store_true',
+                      help='tail a response that is still being written, extracting files as their fences close')
+    parser.add_argument('--idle-timeout', type=float, default=30.0,
+                        help='with --follow, stop after the response has not grown for this many seconds')
+    parser.add_argument('--cache', nargs='?', const=default_cache_dir(), metavar='DIR',
+                        help='reuse the scan of a response seen before, keyed by its SHA-256 '
+                             f'(default DIR: {default_cache_dir()})')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted extraction from its last checkpoint')
+    parser.add_argument('--append', action='store_true',
+                        help='for a transcript that only grows, scan just what was appended since the last '
+                             '--append run')
+    parser.add_argument('--checkpoint-interval', type=float, default=1.0,
+                        help='seconds between checkpoint saves (0 saves after every section)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='leave files whose content is unchanged untouched, preserving their mtimes')
+    parser.add_argument('--atomic', action='store_true',
+                        help='write each file to a temporary sibling and rename it into place')
+    parser.add_argument('--fsync', action='store_true',
+                        help='make atomic writes durable: fsync each file and its directory (implies --atomic)')
+    parser.add_argument('--group-commit', type=int, default=1, metavar='N',
+                        help='with --fsync, rename files in groups of N and sync each directory once per group')
+    parser.add_argument('--archive', metavar='PATH',
+                        help='write the files and the log into a .zip, .tar.gz or .tar archive instead of the '
+                             'output directory, which names its top folder; - streams a tar to stdout')
+    parser.add_argument('--git', metavar='REPO',
+                        help='commit the files to a branch of this git repository with git fast-import '
+                             'instead of writing the output directory')
+    parser.add_argument('--branch', default='extracted', help='with --git, the branch to commit to')
+    parser.add_argument('--store', metavar='DIR',
+                        help='keep file contents once in a content-addressed store shared between runs and '
+                             'link the output files to it')
+    parser.add_argument('--link', choices=('hardlink', 'reflink', 'copy'), default='hardlink',
+                        help='with --store, how output files are made from stored contents')
+    parser.add_argument('--index', metavar='DB',
+                        help='record every extracted file in this SQLite database, kept across runs')
+    parser.add_argument('--json-log', nargs='?', const=True, metavar='PATH',
+                        help='also log a JSON line per section, with byte counts and timings, and a summary '
+                             '(default PATH: extraction_log.jsonl in the output directory)')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='save spans for each stage and file, per thread and process, as Chrome trace-event '
+                             'JSON (open in Perfetto or chrome://tracing)')
+    parser.add_argument('--profile', nargs='?', const='extraction_profile', metavar='PREFIX',
+                        help='save cProfile stats, sampled stacks for flame graphs, a tracemalloc report and '
+                             'hot-path counters as PREFIX.* (default PREFIX: extraction_profile)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="keep Prometheus metrics of the run in this .prom file for node_exporter's textfile "
+                             'collector, rewritten every --metrics-interval seconds')
+    parser.add_argument('--metrics-interval', type=float, default=15.0, metavar='SECONDS',
+                        help='seconds between rewrites of the --metrics file (default: 15)')
+    parser.add_argument('--progress', action='store_true',
+                        help='report percent done, MB/s, files/s and ETA on stderr; a status line on a terminal, '
+                             'otherwise a JSON line every few seconds')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='write files on a pool of this many threads (default: write while scanning)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='split one large response into this many byte ranges extracted in parallel')
+    parser.add_argument('--batch', action='store_true',
+                        help='extract many responses in parallel, each into its own directory under -o')
+    parser.add_argument('--serve', nargs='?', const='-', metavar='SOCKET',
+                        help='stay running and answer JSON-lines extraction requests on this Unix socket, or on '
+                             'stdin/stdout when SOCKET is - or left out; the other options are the defaults for '
+                             'every request')
+    parser.add_argument('--name', default='response.txt', help='with --batch, file name pattern to find in directories')
+    parser.add_argument('-j', '--jobs', type=int, help='with --batch, worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    mode = 'follow' if args.follow else 'mmap' if args.mmap else 'read'
+    writer_options = WriterOptions(
+        skip_unchanged=args.incremental, atomic=args.atomic or args.fsync, fsync=args.fsync,
+        group_commit=args.group_commit, threads=args.threads, index=args.index, json_log=args.json_log,
+        archive=args.archive, git=args.git, branch=args.branch, store=args.store, link=args.link,
+    )
+    if args.json_log is True and (args.archive or args.git):
+        parser.error('--json-log needs a PATH with --archive or --git')
+    if args.json_log and (args.shards or args.batch and args.json_log is not True):
+        parser.error('--json-log cannot be combined with --shards, or given a PATH with --batch')
+    if args.archive:
+        if (args.batch or args.shards or args.resume or args.append or args.incremental
+                or writer_options.atomic):
+            parser.error('--archive cannot be combined with --batch, --shards, --resume, --append, '
+                         '--incremental or --atomic')
+        if args.archive != '-' and not args.archive.endswith(('.zip', '.tar.gz', '.tgz', '.tar')):
+            parser.error('--archive must name a .zip, .tar.gz, .tgz or .tar file, or be -')
+    if args.git:
+        if (args.archive or args.batch or args.shards or args.resume or args.append or args.incremental
+                or writer_options.atomic):
+            parser.error('--git cannot be combined with --archive, --batch, --shards, --resume, --append, '
+                         '--incremental or --atomic')
+    if args.store:
+        if args.archive or args.git or args.shards:
+            parser.error('--store cannot be combined with --archive, --git or --shards')
+    if args.trace:
+        enable_tracing('extract')
+    if args.serve:
+        if (args.responses or args.batch or args.follow or args.shards or args.archive or args.git
+                or args.resume or args.append or args.progress):
+            parser.error('--serve takes responses in requests and cannot be combined with --batch, --follow, '
+                         '--shards, --archive, --git, --resume, --append or --progress')
+        if args.json_log not in (None, True):
+            parser.error('--json-log cannot be given a PATH with --serve')
+        if args.serve != '-' and not hasattr(socket, 'AF_UNIX'):
+            parser.error('Unix sockets are not available here; use --serve - for stdin/stdout')
+    if args.metrics:
+        labels = {'serve': args.serve} if args.serve else {'output': os.path.abspath(args.output_dir)}
+        enable_metrics(args.metrics, labels, args.metrics_interval)
+    if args.progress:
+        if args.follow:
+            parser.error('--progress cannot be combined with --follow, which lists files as they are written')
+        enable_progress()
+    profiler = Profiler(args.profile) if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    started = time.perf_counter()
+    try:
+        run(args, parser, mode, writer_options)
+    except Exception:
+        if METRICS is not None and not args.batch and not args.serve:
+            METRICS.count(responses=1, errors=1)
+        raise
+    finally:
+        if PROGRESS is not None:
+            PROGRESS.stop()
+        if METRICS is not None:
+            METRICS.stop()
+        if profiler is not None:
+            profiler.stop()
+        if args.trace:
+            TRACER.span('main', started)
+            TRACER.save(args.trace)
+
+
+def run(args, parser, mode, writer_options):
+    # main() from parsed arguments on
+    done = 'Extraction complete. Check extraction_log.txt for details.'
+    report = sys.stderr if args.archive == '-' else sys.stdout
+    if args.serve:
+        daemon = Daemon(writer_options, mode, args.cache)
+        if args.serve == '-':
+            daemon.serve_stdio()
+        else:
+            asyncio.run(daemon.serve_socket(args.serve))
+        return
+    if args.batch:
+        if args.follow or not args.responses:
+            parser.error('--batch needs response paths and cannot be combined with --follow')
+        try:
+            summary = extract_batch(args.responses, args.output_dir, mode, resume=args.resume, jobs=args.jobs,
+                                    name=args.name, writer_options=writer_options, parse_cache=args.cache,
+                                    append=args.append)
+        except ValueError as e:
+            parser.error(str(e))
+        exit(1 if summary['failed'] else 0)
+    if len(args.responses) > 1:
+        parser.error('more than one response given; use --batch')
+    if args.shards and (args.follow or args.resume or args.append):
+        parser.error('--shards cannot be combined with --follow, --resume or --append')
+    if args.cache and (args.follow or args.shards):
+        parser.error('--cache cannot be combined with --follow or --shards')
+
+    response_path = args.responses[0] if args.responses else DEFAULT_RESPONSE_PATH
+    if response_path == '-':
+        if args.mmap or args.follow or args.resume or args.append or args.shards or args.cache:
+            parser.error('reading stdin cannot be combined with --mmap, --follow, --resume, --append, --shards '
+                         'or --cache')
+        if PROGRESS is not None:
+            stdin = os.fstat(sys.stdin.fileno())
+            PROGRESS.total = stdin.st_size if stat.S_ISREG(stdin.st_mode) else None
+        asyncio.run(extract_stdin(args.output_dir, writer_options))
+        if METRICS is not None:
+            METRICS.count(responses=1)
+        if PROGRESS is not None:
+            PROGRESS.stop()
+        print(done, file=report)
+        return
     if not os.path.exists(response_path):
         print(f"Error: {response_path} not found. Please verify the file location.")
         response_path = input("Enter the correct path to response.txt: ")
         if not os.path.exists(response_path):
             print(f"Error: {response_path} still not found. Aborting.")
             exit(1)
-    with open(response_path, 'r', encoding='utf-8') as f:
-        response = f.read()
-    extract_files(response)
\ No newline at end of file
+    if PROGRESS is not None:
+        PROGRESS.total = os.path.getsize(response_path)
+    if args.shards:
+        extract_sharded(response_path, args.output_dir, args.shards, writer_options=writer_options)
+    else:
+        extract_path(response_path, args.output_dir, mode, resume=args.resume,
+                     idle_timeout=args.idle_timeout, checkpoint_interval=args.checkpoint_interval,
+                     writer_options=writer_options, parse_cache=args.cache, append=args.append)
+    if METRICS is not None:
+        METRICS.count(responses=1)
+    if PROGRESS is not None:
+        PROGRESS.stop()
+    print(done, file=report)
+
+
+# Main: Read response.txt and run
+if __name__ == '__main__':
+    main()
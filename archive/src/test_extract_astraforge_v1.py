@@ -0,0 +1,555 @@
+# Tests for extract_astraforge_v1.py; run with python -m pytest or
+# python -m unittest from this directory
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import stat
+import subprocess
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+
+import extract_astraforge_v1 as extractor
+from bench_extract_astraforge import generate_response
+
+
+class Interrupted(Exception):
+    pass
+
+
+def tree(root):
+    # {relative path: content} of everything under root but checkpoint
+    # files, with root itself taken out of the log's entries
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.startswith('.extraction_'):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = f.read()
+    if 'extraction_log.txt' in files:
+        files['extraction_log.txt'] = files['extraction_log.txt'].replace(os.fsencode(root), b'OUT')
+    return files
+
+
+def interrupt(response_path, output_dir, sections, writer_options=None, append=False):
+    # An extraction with a checkpoint after every section, stopped by an
+    # error once sections sections are done. With append, it continues
+    # from the last append run as extract_path() does.
+    checkpoint = extractor.Checkpoint(response_path, output_dir, interval=0, append=append)
+    if not (append and checkpoint.load_appended()):
+        checkpoint.clear()
+
+    def events():
+        done = 0
+        for event in extractor.mapped_events(response_path, checkpoint.offset):
+            yield event
+            if event[0] == extractor.END:
+                done += 1
+                if done == sections:
+                    raise Interrupted
+
+    try:
+        extractor.extract_events(events(), output_dir, checkpoint=checkpoint, writer_options=writer_options)
+    except Interrupted:
+        return
+    raise AssertionError('the response has fewer sections than that')
+
+
+class SectionsTest(unittest.TestCase):
+    RESPONSE = (
+        'Intro\n'
+        '## File: src/b.ts\n```ts\nexport const b = 1;\n```\n'
+        '## File: a.md\n````markdown\n# Title\n```python\nprint(1)\n```\n````\n'
+        '### src/b.ts (as above)\n'
+        '## File: c.txt (notes)\n```\nc\n```\n'
+    )
+    EXPECTED = [
+        ('src/b.ts', 'ts', 'export const b = 1;'),
+        ('a.md', 'markdown', '# Title\n```python\nprint(1)\n```'),
+        ('src/b.ts', None, ''),
+        ('c.txt', None, 'c'),
+    ]
+
+    def sections(self, source):
+        return [(section.path, section.language, section.text()) for section in extractor.iter_sections(source)]
+
+    def test_nested_fences(self):
+        self.assertEqual(self.sections(self.RESPONSE), self.EXPECTED)
+        self.assertEqual(self.sections(self.RESPONSE.encode()), self.EXPECTED)
+
+    def test_crlf(self):
+        expected = [(path, language, body.replace('\n', '\r\n')) for path, language, body in self.EXPECTED]
+        crlf = self.RESPONSE.replace('\n', '\r\n')
+        self.assertEqual(self.sections(crlf), expected)
+        self.assertEqual(self.sections(crlf.encode()), expected)
+
+    def test_indented_fences(self):
+        # Up to 3 spaces, as in list items; 4 make the line part of the body
+        response = ('### src/a.ts\n  ```ts\n  const a = 1;\n  ```\n'
+                    '## File: b.txt\n- item\n   ```\n   b\n       ```\n   ```\n')
+        self.assertEqual(self.sections(response),
+                         [('src/a.ts', 'ts', 'const a = 1;'), ('b.txt', None, 'b\n       ```')])
+
+    def test_back_reference(self):
+        # A header-only section for a path leaves its earlier copy alone
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        extractor.extract_events(extractor.read_events(self.RESPONSE.encode()), root)
+        with open(os.path.join(root, 'src', 'b.ts')) as f:
+            self.assertEqual(f.read(), 'export const b = 1;')
+
+
+class ExtractionTestCase(unittest.TestCase):
+    FILES = 500
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.response = os.path.join(self.dir, 'response.txt')
+        generate_response(self.response, 200_000, self.FILES)
+        self.expected = self.extract('expected')
+
+    def out(self, name):
+        return os.path.join(self.dir, name, 'out')
+
+    def extract(self, name, **options):
+        output_dir = self.out(name)
+        extractor.extract_path(self.response, output_dir, **options)
+        return tree(output_dir)
+
+
+class DriverTest(ExtractionTestCase):
+    def test_same_tree_from_every_driver(self):
+        for mode in ('read', 'mmap', 'follow'):
+            with self.subTest(mode=mode):
+                self.assertEqual(self.extract(mode, mode=mode, idle_timeout=0), self.expected)
+        with self.subTest('stdin'):
+            with open(self.response, 'rb') as f:
+                asyncio.run(extractor.extract_stream(extractor.FileStream(f), self.out('stdin')))
+            self.assertEqual(tree(self.out('stdin')), self.expected)
+        with self.subTest('threads'):
+            options = extractor.WriterOptions(threads=4)
+            self.assertEqual(self.extract('threads', writer_options=options), self.expected)
+        with self.subTest('shards'):
+            extractor.extract_sharded(self.response, self.out('shards'), shards=4)
+            self.assertEqual(tree(self.out('shards')), self.expected)
+
+
+class StreamTest(unittest.TestCase):
+    def test_reader_error_leaves_no_temp_files(self):
+        # The error arrives while the write stage holds big.txt open
+        class Reader:
+            def __init__(self):
+                self.parts = [b'## File: a.txt\n```\na\n```\n## File: big.txt\n```\n', b'x\n' * 4096]
+
+            async def read(self, n=-1):
+                if not self.parts:
+                    # Give the other stages time to open big.txt first
+                    await asyncio.sleep(0.2)
+                    raise ConnectionResetError
+                return self.parts.pop(0)
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        options = extractor.WriterOptions(atomic=True)
+        with self.assertRaises(ConnectionResetError):
+            asyncio.run(extractor.extract_stream(Reader(), root, writer_options=options))
+        self.assertEqual(sorted(os.listdir(root)), ['a.txt', 'extraction_log.txt'])
+
+
+class ResumeTest(ExtractionTestCase):
+    def test_resume_each_mode(self):
+        for mode in ('read', 'mmap', 'follow'):
+            with self.subTest(mode=mode):
+                interrupt(self.response, self.out(mode), 137)
+                self.assertEqual(self.extract(mode, mode=mode, resume=True, idle_timeout=0), self.expected)
+
+    def test_json_log_keeps_earlier_runs(self):
+        options = extractor.WriterOptions(json_log=True)
+        interrupt(self.response, self.out('json'), 137, options)
+        self.extract('json', resume=True, writer_options=options)
+        with open(os.path.join(self.out('json'), 'extraction_log.jsonl')) as f:
+            events = [json.loads(line) for line in f]
+        summaries = [event for event in events if event['event'] == 'summary']
+        self.assertEqual([summary['completed'] for summary in summaries], [False, True])
+        self.assertEqual(events[137], summaries[0])
+        self.assertEqual(sum(summary['sections'] for summary in summaries), len(events) - 2)
+
+
+class AppendTest(ExtractionTestCase):
+    def test_growing_transcript_each_mode(self):
+        with open(self.response, 'rb') as f:
+            full = f.read()
+        cuts = sorted(random.Random(7).sample(range(1, len(full)), 6)) + [len(full)]
+        for mode in ('read', 'mmap', 'follow'):
+            with self.subTest(mode=mode):
+                growing = os.path.join(self.dir, f'{mode}.txt')
+                for cut in cuts:
+                    with open(growing, 'wb') as f:
+                        f.write(full[:cut])
+                    extractor.extract_path(growing, self.out(mode), mode, append=True, idle_timeout=0)
+                self.assertEqual(tree(self.out(mode)), self.expected)
+
+    def test_interrupted_append_each_mode(self):
+        with open(self.response, 'rb') as f:
+            full = f.read()
+        for mode in ('read', 'mmap', 'follow'):
+            with self.subTest(mode=mode):
+                growing = os.path.join(self.dir, f'{mode}.txt')
+                with open(growing, 'wb') as f:
+                    f.write(full[:len(full) // 3])
+                extractor.extract_path(growing, self.out(mode), mode, append=True, idle_timeout=0)
+                with open(growing, 'wb') as f:
+                    f.write(full)
+                interrupt(growing, self.out(mode), 100, append=True)
+                extractor.extract_path(growing, self.out(mode), mode, resume=True, append=True, idle_timeout=0)
+                self.assertEqual(tree(self.out(mode)), self.expected)
+
+
+class CacheTest(ExtractionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = os.path.join(self.dir, 'cache')
+
+    def test_hit_replays_the_same_tree(self):
+        self.assertEqual(self.extract('miss', parse_cache=self.cache), self.expected)
+        self.assertEqual(len(os.listdir(self.cache)), 1)
+        with mock.patch.object(extractor.Scanner, 'feed', side_effect=AssertionError('scanned on a hit')):
+            self.assertEqual(self.extract('hit', parse_cache=self.cache), self.expected)
+
+    def test_resume_through_the_cache(self):
+        interrupt(self.response, self.out('miss'), 137)
+        self.assertEqual(self.extract('miss', resume=True, parse_cache=self.cache), self.expected)
+        interrupt(self.response, self.out('hit'), 137)
+        with mock.patch.object(extractor.Scanner, 'feed', side_effect=AssertionError('scanned on a hit')):
+            self.assertEqual(self.extract('hit', resume=True, parse_cache=self.cache), self.expected)
+
+
+class IndexTest(ExtractionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = os.path.join(self.dir, 'index.db')
+        self.options = extractor.WriterOptions(index=self.index)
+        with open(self.response, 'rb') as f:
+            self.source = f.read()
+
+    def rows(self, run_id=None):
+        db = sqlite3.connect(self.index)
+        try:
+            query = 'SELECT run_id, start, end, path, size, sha256, changed FROM files ORDER BY start'
+            return [row[1:] for row in db.execute(query) if run_id is None or row[0] == run_id]
+        finally:
+            db.close()
+
+    def runs(self):
+        db = sqlite3.connect(self.index)
+        try:
+            return db.execute('SELECT run_id, files, unchanged FROM runs ORDER BY started').fetchall()
+        finally:
+            db.close()
+
+    def test_rows(self):
+        self.extract('index', writer_options=self.options)
+        rows = self.rows()
+        self.assertEqual(len(rows), self.expected['extraction_log.txt'].count(b'Created: '))
+        for start, end, path, size, digest, changed in rows:
+            with open(os.path.join(self.out('index'), path), 'rb') as f:
+                body = f.read()
+            self.assertIn(body, self.source[start:end])
+            self.assertTrue(self.source.startswith(b'#', start))
+            self.assertEqual((size, changed), (len(body), 1))
+            self.assertEqual(digest, hashlib.sha256(body).hexdigest())
+        # Files whose last section is rewritten unchanged are recorded as such
+        self.extract('index', writer_options=self.options.replace(skip_unchanged=True))
+        (first, files, _), (second, _, unchanged) = self.runs()
+        self.assertEqual(files, len(rows))
+        self.assertEqual([row[:5] for row in self.rows(second)], [row[:5] for row in rows])
+        self.assertEqual(unchanged, sum(1 for row in self.rows(second) if not row[5]))
+
+    def test_resumed_run(self):
+        self.extract('expected', writer_options=self.options)
+        expected = self.rows()
+        os.remove(self.index)
+        interrupt(self.response, self.out('resumed'), 137, self.options)
+        self.extract('resumed', resume=True, writer_options=self.options)
+        self.assertEqual(self.rows(), expected)
+        self.assertEqual(len(self.runs()), 2)
+
+    def test_sharded_run(self):
+        self.extract('expected', writer_options=self.options)
+        expected = self.rows()
+        os.remove(self.index)
+        extractor.extract_sharded(self.response, self.out('sharded'), shards=4, writer_options=self.options)
+        self.assertEqual(self.rows(), expected)
+        # The shards add up to one run
+        self.assertEqual([files for _, files, _ in self.runs()], [len(expected)])
+
+
+class CommitTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.out = os.path.join(self.dir, 'out')
+
+    def response(self, sections):
+        path = os.path.join(self.dir, 'response.txt')
+        with open(path, 'w') as f:
+            for file_path, body in sections:
+                f.write(f'## File: {file_path}\n```\n{body}\n```\n')
+        return path
+
+    def test_same_path_twice_in_a_group(self):
+        # The second section must compare itself with what the first wrote,
+        # not with the file the first one's pending rename replaces
+        response = self.response([('a.txt', 'A'), ('a.txt', 'OLD')])
+        for threads in (0, 2):
+            with self.subTest(threads=threads):
+                os.makedirs(self.out, exist_ok=True)
+                with open(os.path.join(self.out, 'a.txt'), 'w') as f:
+                    f.write('OLD')
+                extractor.extract_path(response, self.out, writer_options=extractor.WriterOptions(
+                    skip_unchanged=True, atomic=True, group_commit=8, threads=threads))
+                with open(os.path.join(self.out, 'a.txt')) as f:
+                    self.assertEqual(f.read(), 'OLD')
+
+    def test_failed_rename_leaves_no_temp_files(self):
+        response = self.response([('src/a.ts', 'a'), ('c.txt', 'c'), ('src', 'clash'), ('d.txt', 'd')])
+        with self.assertRaises(OSError):
+            options = extractor.WriterOptions(atomic=True, group_commit=8)
+            extractor.extract_path(response, self.out, writer_options=options)
+        names = [name for _, _, files in os.walk(self.out) for name in files]
+        self.assertFalse([name for name in names if name.endswith('.tmp')])
+        self.assertIn('c.txt', names)
+        self.assertTrue(os.path.exists(os.path.join(self.out, extractor.Checkpoint.FILE_NAME)))
+
+
+class ShardTest(unittest.TestCase):
+    def test_cuts_inside_fences(self):
+        # Most header lines are inside fences, where no cut may be made
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        response = os.path.join(root, 'response.txt')
+        with open(response, 'w') as f:
+            for index in range(6):
+                inner = ''.join(f'## File: inner{index}_{line}.txt\nbody\n' for line in range(50))
+                f.write(f'## File: doc{index}.md\n````markdown\n{inner}```\nstill doc{index}\n````\n')
+                f.write(f'## File: shared.txt\n```\n{index}\n```\n')
+        serial, sharded = os.path.join(root, 'serial'), os.path.join(root, 'sharded')
+        extractor.extract_path(response, serial)
+        with open(response, 'rb') as f:
+            headers = {offset for kind, _, offset in extractor.scan(f.read()) if kind == extractor.HEADER}
+        starts = [start for start, _, _ in extractor.plan_shards(response, 16)]
+        self.assertGreater(len(starts), 6)
+        self.assertLessEqual(set(starts), headers)
+        extractor.extract_sharded(response, sharded, shards=16)
+        # The log leaves out the copies of shared.txt that later shards replace
+        expected, files = tree(serial), tree(sharded)
+        del expected['extraction_log.txt'], files['extraction_log.txt']
+        self.assertEqual(files, expected)
+
+
+class BatchTest(unittest.TestCase):
+    def test_output_roots(self):
+        self.assertEqual(extractor.output_roots(['/p/a/response.txt', '/p/b/response.txt'], 'out'),
+                         [os.path.join('out', 'a'), os.path.join('out', 'b')])
+        self.assertEqual(extractor.output_roots(['/p/a/response.txt', '/p/a/response.md', '/p/b.txt'], 'out'),
+                         [os.path.join('out', 'a', 'response.txt'), os.path.join('out', 'a', 'response.md'),
+                          os.path.join('out', 'b')])
+        with self.assertRaises(ValueError):
+            extractor.output_roots(['/p/a.txt', '/p/a.md', '/p/a.txt.md'], 'out')
+
+    def test_each_response_in_its_own_root(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        responses = {'a/response.txt': 'A', 'a/response.md': 'M', 'b/notes.txt': 'B'}
+        for path, body in responses.items():
+            os.makedirs(os.path.join(root, 'in', os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(root, 'in', path), 'w') as f:
+                f.write(f'## File: x.txt\n```\n{body}\n```\n')
+        out = os.path.join(root, 'out')
+        summary = extractor.extract_batch([os.path.join(root, 'in')], out, jobs=2, name='*')
+        self.assertEqual((summary['responses'], summary['failed'], summary['files']), (3, 0, 3))
+        for path, body in responses.items():
+            with open(os.path.join(out, path if path.startswith('a/') else 'b/notes', 'x.txt')) as f:
+                self.assertEqual(f.read(), body)
+
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.out = os.path.join(self.dir, 'out')
+        self.response = os.path.join(self.dir, 'response.txt')
+        with open(self.response, 'w') as f:
+            f.write('## File: src/a.txt\n```\na\n```\n')
+
+    def daemon(self, options=None):
+        daemon = extractor.Daemon(options)
+        self.addCleanup(daemon.close)
+        return daemon
+
+    def respond(self, daemon, request):
+        return daemon.respond(json.dumps(request).encode() if not isinstance(request, bytes) else request)
+
+    def test_errors(self):
+        daemon = self.daemon()
+        for request, error in ((b'not json', 'JSONDecodeError'), (b'[1]', 'ValueError'),
+                               ({'id': 3, 'op': 'nope'}, 'ValueError: unknown op'),
+                               ({'id': 4}, 'ValueError: an extract request needs'),
+                               ({'id': 5, 'response': self.response, 'mode': 'follow'}, 'ValueError: mode'),
+                               ({'id': 6, 'response': os.path.join(self.dir, 'missing.txt')}, 'FileNotFoundError')):
+            with self.subTest(request=request):
+                reply = self.respond(daemon, request)
+                self.assertFalse(reply['ok'])
+                self.assertTrue(reply['error'].startswith(error), reply['error'])
+                self.assertEqual(reply['id'], request.get('id') if isinstance(request, dict) else None)
+        # Still answering after the errors
+        self.assertEqual(self.respond(daemon, {'id': 7, 'op': 'ping'})['requests'], 3)
+
+    def test_extract(self):
+        daemon = self.daemon()
+        reply = self.respond(daemon, {'id': 1, 'response': self.response, 'output_dir': self.out})
+        self.assertEqual((reply['id'], reply['ok'], reply['files']), (1, True, 1))
+        reply = self.respond(daemon, {'id': 2, 'response': self.response, 'output_dir': self.out,
+                                      'incremental': True, 'mode': 'mmap'})
+        self.assertEqual((reply['files'], reply['unchanged']), (0, 1))
+        reply = self.respond(daemon, {'id': 3, 'text': '## File: b.txt\n```\nb\n```\n', 'output_dir': self.out})
+        self.assertEqual(reply['files'], 1)
+        with open(os.path.join(self.out, 'b.txt')) as f:
+            self.assertEqual(f.read(), 'b')
+        self.assertEqual(self.respond(daemon, {'op': 'shutdown'}), {'id': None, 'ok': True, 'seconds': mock.ANY})
+        self.assertTrue(daemon.stopping)
+
+    def test_removed_directories_are_made_again(self):
+        daemon = self.daemon()
+        request = {'response': self.response, 'output_dir': self.out}
+        self.assertTrue(self.respond(daemon, request)['ok'])
+        shutil.rmtree(self.out)
+        self.assertTrue(self.respond(daemon, request)['ok'])
+        self.assertTrue(os.path.isfile(os.path.join(self.out, 'src', 'a.txt')))
+
+    def test_index_connection_reused(self):
+        index = os.path.join(self.dir, 'index.db')
+        daemon = self.daemon(extractor.WriterOptions(index=index))
+        for name in ('one', 'two'):
+            self.assertTrue(self.respond(daemon, {'response': self.response, 'output_dir': self.out + name})['ok'])
+        self.assertEqual(list(daemon.databases), [index])
+        db = sqlite3.connect(index)
+        self.addCleanup(db.close)
+        self.assertEqual(db.execute('SELECT count(*) FROM runs').fetchone(), (2,))
+        self.assertEqual(db.execute('SELECT count(*) FROM files').fetchone(), (2,))
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'needs Unix sockets')
+    def test_socket_round_trip(self):
+        path = os.path.join(self.dir, 'daemon.sock')
+        # A socket left behind by a daemon that died is replaced
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(path)
+        stale.close()
+        daemon = self.daemon()
+
+        async def session():
+            server = asyncio.ensure_future(daemon.serve_socket(path))
+            while not os.path.exists(path) or not hasattr(daemon, 'stopped'):
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_unix_connection(path)
+            replies = []
+            for request in ({'id': 1, 'op': 'ping'}, {'id': 2, 'response': self.response, 'output_dir': self.out},
+                            {'id': 3, 'op': 'shutdown'}):
+                writer.write(json.dumps(request).encode() + b'\n')
+                await writer.drain()
+                replies.append(json.loads(await reader.readline()))
+            writer.close()
+            await asyncio.wait_for(server, 5)
+            return replies
+
+        replies = asyncio.run(session())
+        self.assertEqual([(reply['id'], reply['ok']) for reply in replies], [(1, True), (2, True), (3, True)])
+        self.assertEqual(replies[1]['files'], 1)
+        self.assertFalse(os.path.exists(path))
+
+
+class StoreTest(unittest.TestCase):
+    def test_later_runs_do_not_write_through_store_links(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        store, out = os.path.join(root, 'store'), os.path.join(root, 'out')
+        original, changed = (os.path.join(root, name) for name in ('original.txt', 'changed.txt'))
+        for path, body in ((original, 'original'), (changed, 'CHANGED')):
+            with open(path, 'w') as f:
+                f.write(f'## File: a.txt\n```\n{body}\n```\n')
+        linked = extractor.WriterOptions(store=store, link='hardlink')
+        extractor.extract_path(original, out, writer_options=linked)
+        blobs = [os.path.join(d, name) for d, _, names in os.walk(os.path.join(store, 'objects')) for name in names]
+        for skip_unchanged, atomic in itertools.product((False, True), repeat=2):
+            with self.subTest(skip_unchanged=skip_unchanged, atomic=atomic):
+                extractor.extract_path(original, out, writer_options=linked)
+                options = extractor.WriterOptions(skip_unchanged=skip_unchanged, atomic=atomic)
+                extractor.extract_path(changed, out, writer_options=options)
+                with open(os.path.join(out, 'a.txt')) as f:
+                    self.assertEqual(f.read(), 'CHANGED')
+                # Not left read-only like the blobs, for plain runs after it
+                self.assertTrue(os.stat(os.path.join(out, 'a.txt')).st_mode & stat.S_IWUSR)
+                for blob in blobs:
+                    with open(blob) as f:
+                        self.assertEqual(f.read(), 'original')
+
+
+class UnsafePathTest(unittest.TestCase):
+    SECTIONS = {'./src/a.ts': 'a', 'src//b.ts': 'b', '../evil.txt': 'x', '/tmp/evil.txt': 'x', 'c/../../evil': 'x'}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.response = os.path.join(self.dir, 'response.txt')
+        with open(self.response, 'w') as f:
+            for path, body in self.SECTIONS.items():
+                f.write(f'## File: {path}\n```\n{body}\n```\n')
+
+    def test_archive_members(self):
+        archive = os.path.join(self.dir, 'out.tar')
+        options = extractor.WriterOptions(archive=archive)
+        extractor.extract_path(self.response, os.path.join(self.dir, 'out'), writer_options=options)
+        with tarfile.open(archive) as tar:
+            names = sorted(tar.getnames())
+        self.assertEqual(names, ['out/extraction_log.txt', 'out/src/a.ts', 'out/src/b.ts'])
+
+    def test_directory(self):
+        extractor.extract_path(self.response, os.path.join(self.dir, 'a', 'out'))
+        self.assertEqual(sorted(tree(os.path.join(self.dir, 'a'))), ['out/extraction_log.txt', 'out/src/a.ts',
+                                                                     'out/src/b.ts'])
+
+    def test_two_spellings_of_one_path(self):
+        # ./a.txt and a.txt must be one file to the writer threads, or the
+        # long first section is still being written when the second lands
+        with open(self.response, 'w') as f:
+            f.write('## File: ./a.txt\n```\n' + 'A' * (20 << 20) + '\n```\n## File: a.txt\n```\nB\n```\n')
+        for threads in (0, 4):
+            with self.subTest(threads=threads):
+                out = os.path.join(self.dir, f'out{threads}')
+                extractor.extract_path(self.response, out, writer_options=extractor.WriterOptions(threads=threads))
+                with open(os.path.join(out, 'a.txt')) as f:
+                    self.assertEqual(f.read(), 'B')
+
+    @unittest.skipUnless(shutil.which('git'), 'needs git')
+    def test_git_tree(self):
+        repo = os.path.join(self.dir, 'repo')
+        options = extractor.WriterOptions(git=repo)
+        extractor.extract_path(self.response, os.path.join(self.dir, 'out'), writer_options=options)
+        files = subprocess.run(['git', '-C', repo, 'ls-tree', '-r', '--name-only', 'extracted'],
+                               capture_output=True, text=True, check=True).stdout.split()
+        self.assertEqual(files, ['extraction_log.txt', 'src/a.ts', 'src/b.ts'])
+        subprocess.run(['git', '-C', repo, 'fsck', '--strict', '--no-progress'], capture_output=True, check=True)
+
+
+if __name__ == '__main__':
+    unittest.main()